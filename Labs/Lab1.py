@@ -1,5 +1,13 @@
 import streamlit as st
-from openai import OpenAI
+import hashlib
+from lab_utils.resources import get_openai_client, validate_api_key
+from lab_utils.chunking import chunk_text, count_text_tokens
+from lab_utils.bm25 import BM25Index
+
+# documents up to this size are still sent whole
+FULL_DOCUMENT_TOKENS = 3000
+# otherwise only this many of the best-matching chunks are sent
+TOP_CHUNKS = 5
 
 # Show title and description.
 st.title("My Document question answering")
@@ -8,14 +16,39 @@ st.write(
     "To use this app, you need to provide an OpenAI API key, which you can get [here](https://platform.openai.com/account/api-keys). "
 )
 
-def validate_api_key(api_key):
-    """Validate the API key by making a lightweight API call."""
-    try:
-        client = OpenAI(api_key=api_key)
-        client.models.list()
-        return True, None
-    except Exception as e:
-        return False, str(e)
+def get_document_index(document):
+    """Chunk the document and build a BM25 index over the chunks.
+
+    Built once per uploaded file and kept in the session, keyed by the
+    file's hash, so follow-up questions reuse it.
+    Returns None for documents small enough to send whole.
+    """
+    doc_hash = hashlib.sha256(document.encode("utf-8")).hexdigest()
+    cached = st.session_state.get("lab1_index")
+    if cached and cached["hash"] == doc_hash:
+        return cached["index"]
+
+    index = None
+    if count_text_tokens(document) > FULL_DOCUMENT_TOKENS:
+        index = BM25Index()
+        for offset, text in chunk_text(document):
+            index.add(offset, text)
+    # only keep the current file's index around
+    st.session_state.lab1_index = {"hash": doc_hash, "index": index}
+    return index
+
+def document_context(document, question):
+    """The part of the document to send with the question."""
+    index = get_document_index(document)
+    if index is None:
+        return document
+    offsets = [offset for offset, _ in index.search(question, k=TOP_CHUNKS)]
+    if not offsets:
+        # no words in common, fall back to the start of the document
+        offsets = sorted(index.docs)[:TOP_CHUNKS]
+    # keep the chunks in document order so they read naturally
+    excerpts = [index.docs[offset]["text"] for offset in sorted(offsets)]
+    return "\n\n[...]\n\n".join(excerpts)
 
 # Ask user for their OpenAI API key via `st.text_input`.
 openai_api_key = st.text_input("OpenAI API Key", type="password")
@@ -23,7 +56,7 @@ openai_api_key = st.text_input("OpenAI API Key", type="password")
 if not openai_api_key:
     st.info("Please add your OpenAI API key to continue.", icon="🗝️")
 else:
-    # Validate the API key immediately
+    # Validate the API key immediately (the result is cached, so reruns don't repeat the call)
     with st.spinner("Validating API key..."):
         is_valid, error = validate_api_key(openai_api_key)
     
@@ -32,8 +65,8 @@ else:
     else:
         st.success("API key is valid!", icon="✅")
         
-        # Create an OpenAI client.
-        client = OpenAI(api_key=openai_api_key)
+        # Get the shared OpenAI client for this key.
+        client = get_openai_client(openai_api_key)
 
         # Let the user upload a file via `st.file_uploader`.
         uploaded_file = st.file_uploader(
@@ -50,10 +83,12 @@ else:
         if uploaded_file and question:
             # Process the uploaded file and question.
             document = uploaded_file.read().decode()
+            # large documents are reduced to the excerpts that best match the question
+            context = document_context(document, question)
             messages = [
                 {
                     "role": "user",
-                    "content": f"Here's a document: {document} \n\n---\n\n {question}",
+                    "content": f"Here's a document: {context} \n\n---\n\n {question}",
                 }
             ]
 
@@ -1,13 +1,9 @@
 import streamlit as st
-from openai import OpenAI
-import PyPDF2
+from lab_utils.resources import get_openai_client
+from lab_utils.pdf_cache import cached_extract_pages, pdf_cache
+from lab_utils.summarize import needs_map_reduce, condense_document, build_summary_messages
+from lab_utils.summary_cache import summary_cache, document_hash, replay_stream
 
-def extract_text_from_pdf(uploaded_file):
-    reader = PyPDF2.PdfReader(uploaded_file)
-    text = ''
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
 # Show title and description.
 st.title("Document Summarizer")
 st.write("Upload a document below and get a summary!")
@@ -30,11 +26,15 @@ use_advanced = st.sidebar.checkbox("Use advanced model")
 model = "gpt-4o" if use_advanced else "gpt-4o-mini"
 st.sidebar.caption(f"Current model: {model}")
 
+# Summary cache
+bypass_cache = st.sidebar.checkbox("Bypass summary cache",
+                                   help="Always generate a fresh summary, even for a document summarized before.")
+
 # Get API key from secrets
 openai_api_key = st.secrets.get("OPENAI_API_KEY")
 
 if openai_api_key:
-    client = OpenAI(api_key=openai_api_key)
+    client = get_openai_client(openai_api_key)
 
     # Let the user upload a file
     uploaded_file = st.file_uploader(
@@ -45,7 +45,19 @@ if openai_api_key:
         if file_extension == 'txt':
             document = uploaded_file.read().decode()
         elif file_extension == 'pdf':
-            document = extract_text_from_pdf(uploaded_file)
+            pages = cached_extract_pages(uploaded_file)
+            document = "\n".join(page.text for page in pages)
+            extract_seconds = sum(page.seconds for page in pages)
+            slowest = max(pages, key=lambda page: page.seconds, default=None)
+            if slowest:
+                st.caption(
+                    f"Extracted {len(pages)} pages ({extract_seconds:.2f}s of page work, "
+                    f"slowest: page {slowest.page} at {slowest.seconds:.2f}s)"
+                )
+            cache_stats = pdf_cache.stats()
+            st.sidebar.caption(
+                f"PDF text cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses"
+            )
         else:
             st.error("Unsupported file type.")
             st.stop()
@@ -61,18 +73,37 @@ if openai_api_key:
             else:
                 instruction = "Summarize the following document in 5 bullet points."
             
-            messages = [
-                {
-                    "role": "user",
-                    "content": f"{instruction}\n\nDocument: {document}",
-                }
-            ]
+            doc_hash = document_hash(document)
+            cached_summary = None if bypass_cache else summary_cache.get(doc_hash, summary_type, model)
 
-            # Generate summary using OpenAI API
-            stream = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                stream=True,
-            )
+            if cached_summary:
+                st.caption("Summary served from cache.")
+                st.write_stream(replay_stream(cached_summary))
+            else:
+                # long documents: summarize sections in parallel first, then summarize the summaries
+                condensed = needs_map_reduce(document)
+                if condensed:
+                    progress = st.progress(0.0, text="Summarizing sections...")
+
+                    def show_progress(done, total):
+                        progress.progress(done / total, text=f"Summarized {done} of {total} sections")
+
+                    # only long documents need the async client, so it's imported here
+                    from openai import AsyncOpenAI
+                    async_client = AsyncOpenAI(api_key=openai_api_key)
+                    source_text = condense_document(async_client, document, model, on_progress=show_progress)
+                    progress.empty()
+                else:
+                    source_text = document
+
+                messages = build_summary_messages(instruction, source_text, condensed)
+
+                # Generate summary using OpenAI API
+                stream = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                )
 
-            st.write_stream(stream)
\ No newline at end of file
+                summary = st.write_stream(stream)
+                summary_cache.put(doc_hash, summary_type, model, summary)
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
-from openai import OpenAI
+from lab_utils.resources import get_openai_client
+from lab_utils.conversation import ConversationBuffer
 
 # show title and description
 st.title("My Lab3 Question Answering Chatbot")
@@ -29,15 +30,17 @@ If the user says "No", "no", "nope", or any negative response:
 - Then ask: "What else can I help you with?" to go back to the start"""
 }
 
-# create an OpenAI client
-if 'client' not in st.session_state:
-    api_key = st.secrets["OPENAI_API_KEY"]
-    st.session_state.client = OpenAI(api_key=api_key)
+# shared OpenAI client
+client = get_openai_client()
 
 if "messages" not in st.session_state:
-    st.session_state["messages"] = [
-        {"role": "assistant", "content": "How can I help you?"}
-    ]
+    st.session_state["messages"] = ConversationBuffer(
+        pinned=[{"role": "assistant", "content": "How can I help you?"}],
+        model=model_to_use,
+    )
+
+# tokens of conversation history sent with each question (greeting is always sent)
+TOKEN_BUDGET = 1000
 
 # display all messages in the chat history
 for msg in st.session_state.messages:
@@ -50,20 +53,11 @@ if prompt := st.chat_input("What is your question?"):
         st.markdown(prompt)
     
     # create buffered messages for API call
-    # ALWAYS start with system prompt (never buffered out)
-    buffered_messages = [SYSTEM_PROMPT]
-    
-    # add initial greeting
-    buffered_messages.append(st.session_state.messages[0])
-    
-    # get the last 4 messages (2 user + 2 assistant exchanges)
-    recent_messages = st.session_state.messages[1:]
-    if len(recent_messages) > 4:
-        recent_messages = recent_messages[-4:]
-    
-    buffered_messages.extend(recent_messages)
+    # ALWAYS start with system prompt (never buffered out),
+    # then the greeting and as many recent messages as fit the token budget
+    recent_messages, _ = st.session_state.messages.select(TOKEN_BUDGET)
+    buffered_messages = [SYSTEM_PROMPT] + recent_messages
     
-    client = st.session_state.client
     stream = client.chat.completions.create(
         model=model_to_use,
         messages=buffered_messages,
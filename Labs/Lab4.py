@@ -1,43 +1,69 @@
 import streamlit as st
-from openai import OpenAI
-import requests
-from bs4 import BeautifulSoup
-import tiktoken
+from lab_utils.resources import get_openai_client
 import sys
-import chromadb
+import os
+import json
+import hashlib
 from pathlib import Path
-from PyPDF2 import PdfReader
-
-__import__('pysqlite3')
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-
-chroma_client = chromadb.PersistentClient(path='./ChromaDB_for_lab')
-collection = chroma_client.get_or_create_collection('Lab4Collection')                                        
-
-def read_url_content(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        return soup.get_text()
-    except requests.RequestException as e:
-        st.error(f"Error reading {url}: {e}")
-        return None
-
-def count_tokens(messages, model="gpt-4o-mini"):
-    """Count the total tokens in a list of messages."""
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    
-    total_tokens = 0
-    for message in messages:
-        total_tokens += 4
-        for key, value in message.items():
-            total_tokens += len(encoding.encode(value))
-    total_tokens += 2
-    return total_tokens
+from lab_utils.pdf_extract import extract_many
+from lab_utils.pdf_cache import pdf_cache
+from lab_utils.embedding_cache import embedding_cache
+from lab_utils.bm25 import BM25Index, reciprocal_rank_fusion
+from lab_utils.conversation import ConversationBuffer, count_tokens
+from lab_utils.chunking import chunk_text
+from lab_utils.http_fetch import fetch_urls
+from lab_utils.html_text import page_text
+from lab_utils.background import BackgroundJob
+
+CHROMA_PATH = './ChromaDB_for_lab'
+DATA_FOLDER = './Lab-04-Data/'
+# remembers which files (and which chunk ids) are already in the collection
+MANIFEST_FILE = Path(CHROMA_PATH) / 'lab4_manifest.json'
+# lexical (BM25) index over the same chunks, saved next to the manifest
+BM25_FILE = Path(CHROMA_PATH) / 'lab4_bm25.json'
+
+@st.cache_resource(show_spinner=False)
+def get_document_index():
+    """Open the Chroma collection and the BM25 index, once per process.
+
+    chromadb takes over a second to import, so this runs on the indexing
+    thread (see index_documents) instead of when the page first loads.
+    Returns (collection, bm25_index).
+    """
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+    import chromadb
+
+    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    # chunks are stored per page/offset, so this is a separate collection from the old whole-file one
+    collection = chroma_client.get_or_create_collection('Lab4ChunkCollection')
+
+    index = BM25Index.load(BM25_FILE)
+    if len(index) == 0 and collection.count() > 0:
+        # collection was built before the lexical index existed
+        existing = collection.get(include=["documents", "metadatas"])
+        for doc_id, text, meta in zip(existing["ids"], existing["documents"], existing["metadatas"]):
+            index.add(doc_id, text, meta)
+        index.save(BM25_FILE)
+    return collection, index
+
+# tokens of page text each URL may add to the system prompt
+URL_TOKEN_BUDGET = 1500
+
+def read_url_contents(urls):
+    """Fetch all URLs at once (through the shared pool and HTTP cache) and return their text.
+
+    Only the page's main content is kept, trimmed to URL_TOKEN_BUDGET tokens.
+    Returns a list with the page text, or None on failure, for each URL.
+    """
+    contents = []
+    for result in fetch_urls(urls):
+        if result.error:
+            st.error(f"Error reading {result.url}: {result.error}")
+            contents.append(None)
+        else:
+            contents.append(page_text(result.url, result.content, URL_TOKEN_BUDGET))
+    return contents
 
 # show title and description
 st.title("My Lab4 Question Answering Chatbot")
@@ -62,17 +88,16 @@ st.sidebar.markdown("### Provide URLs for Context")
 url1 = st.sidebar.text_input("URL 1", placeholder="https://example.com")
 url2 = st.sidebar.text_input("URL 2", placeholder="https://example.com")
 
-# Load URL content when provided
+# Load URL content when provided (both URLs are fetched concurrently)
 url_context = ""
-for i, url in enumerate([url1, url2], 1):
-    if url.strip():
-        content = read_url_content(url.strip())
-        if content:
-            truncated = content[:5000]
-            url_context += f"\n\n--- Content from URL {i} ({url}) ---\n{truncated}"
-            st.sidebar.success(f"URL {i} loaded successfully!")
-        else:
-            st.sidebar.error(f"URL {i} could not be loaded.")
+provided = [(i, url.strip()) for i, url in enumerate([url1, url2], 1) if url.strip()]
+fetched = read_url_contents([url for _, url in provided])
+for (i, url), content in zip(provided, fetched):
+    if content:
+        url_context += f"\n\n--- Content from URL {i} ({url}) ---\n{content}"
+        st.sidebar.success(f"URL {i} loaded successfully!")
+    else:
+        st.sidebar.error(f"URL {i} could not be loaded.")
 
 # define the system prompt with URL context baked in
 base_system_content = """You are a helpful question answering assistant. Your job is to get the user's question and answer it clearly and accurately.
@@ -101,49 +126,240 @@ SYSTEM_PROMPT = {
     "content": base_system_content
 }
 
-def add_to_collection(collection, text, file_name):
-    client = st.session_state.client
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    embedding = response.data[0].embedding
-    collection.add(
-        documents=[text],
-        ids=[file_name],
-        embeddings=[embedding]
-    )
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBED_BATCH_SIZE = 100
 
-def extract_text_from_pdf(pdf_path):
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
+def add_to_collection(collection, bm25_index, chunks, client):
+    """Embed a batch of chunks with (at most) one API call and store them with one collection.upsert.
 
-def load_pdfs_to_collection(folder_path, collection):
+    Each chunk is a dict with 'id', 'text', and 'metadata' keys.
+    """
+    # chunks embedded before (e.g. an unchanged page of an edited PDF) come from the cache
+    embeddings = embedding_cache.embed(
+        client, [chunk["text"] for chunk in chunks], EMBEDDING_MODEL
+    )
+    collection.upsert(
+        documents=[chunk["text"] for chunk in chunks],
+        ids=[chunk["id"] for chunk in chunks],
+        metadatas=[chunk["metadata"] for chunk in chunks],
+        embeddings=embeddings
+    )
+    for chunk in chunks:
+        bm25_index.add(chunk["id"], chunk["text"], chunk["metadata"])
+
+def chunk_pdf(pdf_path, pages):
+    """Turn a PDF's extracted pages into chunk dicts with source/page/offset metadata."""
+    chunks = []
+    for page in pages:
+        if not page.text.strip():
+            continue
+        for offset, text in chunk_text(page.text):
+            chunks.append({
+                "id": f"{pdf_path.name}::p{page.page}::t{offset}",
+                "text": text,
+                "metadata": {"source": pdf_path.name, "page": page.page, "offset": offset},
+            })
+    return chunks
+
+def file_hash(path):
+    """SHA-256 of a file's bytes, read in blocks so big PDFs don't sit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest():
+    """Manifest maps file name -> {'hash', 'mtime', 'size', 'chunk_ids'}."""
+    if MANIFEST_FILE.exists():
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest):
+    # write to a temp file first so a crash never leaves a half-written manifest
+    tmp_file = MANIFEST_FILE.with_suffix(".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+def sync_pdfs_to_collection(folder_path, collection, bm25_index, client, progress=None):
+    """Bring the collection in line with the PDFs on disk.
+
+    Files whose size and mtime match the manifest are skipped without being
+    read. Everything else is hashed; only new or changed files are chunked and
+    embedded, and chunks of changed or deleted files are removed.
+    progress(done, total, message) is called as files are indexed.
+    Returns a dict with the names of added, updated and removed files.
+    """
+    progress = progress or (lambda done, total, message: None)
+    manifest = load_manifest()
     folder = Path(folder_path)
-    pdf_files = list(folder.glob("*.pdf"))
-    for pdf_file in pdf_files:
-        text = extract_text_from_pdf(pdf_file)
-        if text.strip():
-            add_to_collection(collection, text, pdf_file.name)
+    pdf_files = sorted(folder.glob("*.pdf"))
+    changes = {"added": [], "updated": [], "removed": []}
+    to_index = []
 
-# create an OpenAI client
-if 'client' not in st.session_state:
-    api_key = st.secrets["OPENAI_API_KEY"]
-    st.session_state.client = OpenAI(api_key=api_key)
-
-if collection.count() == 0:
-    load_pdfs_to_collection('./Lab-04-Data/', collection)
-
-st.sidebar.write(f"Documents in ChromaDB: {collection.count()}")
+    for pdf_file in pdf_files:
+        stat = pdf_file.stat()
+        entry = manifest.get(pdf_file.name)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            continue
+
+        digest = file_hash(pdf_file)
+        if entry and entry["hash"] == digest:
+            # touched but not changed, just remember the new mtime
+            entry["mtime"] = stat.st_mtime
+            continue
+
+        if entry:
+            if entry["chunk_ids"]:
+                collection.delete(ids=entry["chunk_ids"])
+                bm25_index.remove(entry["chunk_ids"])
+            changes["updated"].append(pdf_file.name)
+        else:
+            changes["added"].append(pdf_file.name)
+        to_index.append((pdf_file, digest, stat))
+
+    if to_index:
+        progress(0, len(to_index), f"Extracting text from {len(to_index)} PDF(s)...")
+    # reuse cached page text where we can, extract the rest in parallel
+    extracted = {}
+    for pdf_file, digest, _ in to_index:
+        pages = pdf_cache.get(digest)
+        if pages is not None:
+            extracted[pdf_file] = pages
+    uncached = [pdf_file for pdf_file, _, _ in to_index if pdf_file not in extracted]
+    extracted.update(extract_many(uncached))
+    for pdf_file, digest, _ in to_index:
+        if pdf_file in uncached:
+            pdf_cache.put(digest, extracted[pdf_file])
+
+    pending = []
+    for done, (pdf_file, digest, stat) in enumerate(to_index, 1):
+        chunks = chunk_pdf(pdf_file, extracted[pdf_file])
+        manifest[pdf_file.name] = {
+            "hash": digest,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "chunk_ids": [chunk["id"] for chunk in chunks],
+        }
+        pending.extend(chunks)
+        # send full batches as soon as we have them
+        while len(pending) >= EMBED_BATCH_SIZE:
+            add_to_collection(collection, bm25_index, pending[:EMBED_BATCH_SIZE], client)
+            pending = pending[EMBED_BATCH_SIZE:]
+        progress(done, len(to_index), f"Indexed {pdf_file.name}")
+    if pending:
+        add_to_collection(collection, bm25_index, pending, client)
+
+    on_disk = {pdf_file.name for pdf_file in pdf_files}
+    for name in list(manifest):
+        if name not in on_disk:
+            if manifest[name]["chunk_ids"]:
+                collection.delete(ids=manifest[name]["chunk_ids"])
+                bm25_index.remove(manifest[name]["chunk_ids"])
+            del manifest[name]
+            changes["removed"].append(name)
+
+    save_manifest(manifest)
+    if any(changes.values()):
+        bm25_index.save(BM25_FILE)
+    return changes
+
+RETRIEVE_K = 5
+
+def retrieve(prompt, collection, bm25_index, client, k=RETRIEVE_K):
+    """Hybrid retrieval: BM25 and vector results fused with reciprocal-rank fusion.
+
+    When the lexical match is clear-cut (e.g. a course code), the BM25
+    results are used on their own and no query embedding is needed.
+    Returns (list of (text, metadata), mode).
+    """
+    lexical = bm25_index.search(prompt, k=k * 2)
+    # a re-index may be running; chunks it removed since the search are skipped
+    lexical_docs = {doc_id: bm25_index.get(doc_id) for doc_id, _ in lexical}
+    if bm25_index.is_confident(prompt, lexical):
+        docs = [lexical_docs[doc_id] for doc_id, _ in lexical[:k]]
+        return [(doc["text"], doc["metadata"]) for doc in docs if doc], "lexical"
+
+    query_embedding = embedding_cache.embed(client, [prompt], EMBEDDING_MODEL)[0]
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=k * 2
+    )
+    found = {}
+    vector_ids = []
+    if results and results['ids']:
+        vector_ids = results['ids'][0]
+        for doc_id, doc, meta in zip(vector_ids, results['documents'][0], results['metadatas'][0]):
+            found[doc_id] = (doc, meta)
+    for doc_id, doc in lexical_docs.items():
+        if doc_id not in found and doc:
+            found[doc_id] = (doc["text"], doc["metadata"])
+
+    fused = reciprocal_rank_fusion([vector_ids, [doc_id for doc_id, _ in lexical]])
+    return [found[doc_id] for doc_id in fused if doc_id in found][:k], "hybrid"
+
+def index_documents(folder_path, client, progress):
+    """Open the index and sync it with the data folder (runs on the indexing thread)."""
+    progress(0, 0, "Loading the document index...")
+    collection, bm25_index = get_document_index()
+    progress(0, 0, "Checking the course documents for changes...")
+    return sync_pdfs_to_collection(folder_path, collection, bm25_index, client, progress)
+
+@st.cache_resource
+def get_indexing_job():
+    """One indexing job per process; its progress is shown to every session."""
+    return BackgroundJob(index_documents, name="lab4-indexing")
+
+# shared OpenAI client
+client = get_openai_client()
+indexing_job = get_indexing_job()
+
+# documents are indexed in the background, so the page (and chat) is usable right away.
+# The data folder is checked once per process (the first session to open the page), or again on request.
+reindex = st.sidebar.button("Re-index documents")
+if indexing_job.status == "idle" or reindex:
+    indexing_job.start(DATA_FOLDER, client)
+
+# polls while indexing runs, then re-runs the page once so the chat can use the documents
+@st.fragment(run_every=1 if indexing_job.running else None)
+def show_indexing_status():
+    if indexing_job.running:
+        if indexing_job.total:
+            st.progress(indexing_job.fraction, text=indexing_job.message)
+        else:
+            st.caption(f"⏳ {indexing_job.message}")
+        st.session_state.lab4_indexing_seen = True
+        return
+    if st.session_state.pop("lab4_indexing_seen", False):
+        st.rerun()
+    if indexing_job.status == "failed":
+        st.error(f"Indexing failed: {indexing_job.error}")
+    elif indexing_job.status == "done":
+        collection, _ = get_document_index()
+        st.write(f"Chunks in ChromaDB: {collection.count()}")
+        for kind in ("added", "updated", "removed"):
+            if indexing_job.result[kind]:
+                st.caption(f"Re-indexed ({kind}): {', '.join(indexing_job.result[kind])}")
+        st.caption(f"Last indexing run took {indexing_job.seconds:.1f}s")
+
+with st.sidebar:
+    show_indexing_status()
+
+embed_stats = embedding_cache.stats()
+st.sidebar.caption(
+    f"Embedding cache hit rate: {embed_stats['hit_rate']:.0%} "
+    f"({embed_stats['memory_hits']} memory, {embed_stats['disk_hits']} disk, "
+    f"{embed_stats['misses']} misses)"
+)
   
 
 if "messages" not in st.session_state:
-    st.session_state["messages"] = [
-        {"role": "assistant", "content": "How can I help you?"}
-    ]
+    st.session_state["messages"] = ConversationBuffer(
+        pinned=[{"role": "assistant", "content": "How can I help you?"}],
+        model=model_to_use,
+    )
 
 # display all messages in the chat history
 for msg in st.session_state.messages:
@@ -155,23 +371,21 @@ if prompt := st.chat_input("What is your question?"):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # --- RAG Retrieval: query ChromaDB for relevant context ---
-    query_response = st.session_state.client.embeddings.create(
-        input=prompt,
-        model="text-embedding-3-small"
-    )
-    query_embedding = query_response.data[0].embedding
-
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=3
-    )
+    # --- RAG Retrieval: BM25 + ChromaDB for relevant context ---
+    retrieved = []
+    # once a sync has finished, the index stays usable while a re-index updates it
+    if indexing_job.result is None:
+        if indexing_job.running:
+            st.sidebar.caption("Course documents are still being indexed; this answer doesn't use them.")
+    else:
+        collection, bm25_index = get_document_index()
+        retrieved, retrieval_mode = retrieve(prompt, collection, bm25_index, client)
+        st.sidebar.caption(f"Retrieval mode for last question: {retrieval_mode}")
 
     rag_context = ""
-    if results and results['documents']:
-        for i, doc in enumerate(results['documents'][0]):
-            source = results['ids'][0][i]
-            rag_context += f"\n\n--- Retrieved from {source} ---\n{doc[:3000]}"
+    for doc, meta in retrieved:
+        source = f"{meta['source']}, page {meta['page']}"
+        rag_context += f"\n\n--- Retrieved from {source} ---\n{doc}"
 
     # Inject RAG context into system prompt
     rag_system_prompt = dict(SYSTEM_PROMPT)
@@ -183,38 +397,18 @@ The following content was retrieved from course documents and may be relevant to
 
     TOKEN_BUDGET = 2000
 
-    buffered_messages = [rag_system_prompt]
-
-    initial_greeting = st.session_state.messages[0]
-    buffered_messages.append(initial_greeting)
-
-    base_tokens = count_tokens(buffered_messages, model_to_use)
-
-    conversation_messages = st.session_state.messages[1:]
-
-    selected_messages = []
-    running_tokens = base_tokens
-
-    for msg in reversed(conversation_messages):
-        msg_tokens = count_tokens([msg], model_to_use)
-        if running_tokens + msg_tokens <= TOKEN_BUDGET + base_tokens:
-            selected_messages.insert(0, msg)
-            running_tokens += msg_tokens
-        else:
-            break
-
-    buffered_messages.extend(selected_messages)
+    # greeting is pinned; the newest messages that fit the budget follow it
+    selected_messages, conversation_tokens = st.session_state.messages.select(TOKEN_BUDGET)
+    buffered_messages = [rag_system_prompt] + selected_messages
 
     # Display token usage info in sidebar
-    total_tokens = count_tokens(buffered_messages, model_to_use)
     st.sidebar.markdown("### Token Usage")
     st.sidebar.write(f"System prompt tokens: {count_tokens([SYSTEM_PROMPT], model_to_use)}")
-    st.sidebar.write(f"Conversation buffer tokens: {running_tokens - base_tokens}")
+    st.sidebar.write(f"Conversation buffer tokens: {conversation_tokens}")
     st.sidebar.write(f"Token budget for conversation: {TOKEN_BUDGET}")
     st.sidebar.write(f"Total messages in buffer: {len(buffered_messages)}")
     st.sidebar.write(f"Total messages in history: {len(st.session_state.messages)}")
 
-    client = st.session_state.client
     stream = client.chat.completions.create(
         model=model_to_use,
         messages=buffered_messages,
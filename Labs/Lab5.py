@@ -1,15 +1,31 @@
 import json
-import requests
+import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from openai import OpenAI
+from lab_utils.http_fetch import get_session
+from lab_utils.resources import get_openai_client
+from lab_utils.ttl_cache import TTLCache
+
+# Weather barely changes within 10 minutes, so results are reused for that long
+WEATHER_TTL_SECONDS = 10 * 60
+WEATHER_TIMEOUT = (5, 10)   # (connect, read) seconds
+# load tests point this at lab_utils.mock_openai, which serves the same route
+WEATHER_URL = os.environ.get('OPENWEATHER_URL', 'https://api.openweathermap.org/data/2.5/weather')
+
+
+@st.cache_resource
+def get_weather_cache():
+    # one cache per process, shared by every session
+    return TTLCache(WEATHER_TTL_SECONDS, max_items=512)
+
 
 # ── Weather helper ──────────────────────────────────────────────────
 def get_current_weather(location, api_key, units='imperial'):
-    url = (
-        f'https://api.openweathermap.org/data/2.5/weather'
-        f'?q={location}&appid={api_key}&units={units}'
+    response = get_session().get(
+        WEATHER_URL,
+        params={'q': location, 'appid': api_key, 'units': units},
+        timeout=WEATHER_TIMEOUT,
     )
-    response = requests.get(url)
 
     if response.status_code == 401:
         raise Exception('Authentication failed: Invalid API key (401 Unauthorized)')
@@ -34,6 +50,16 @@ def get_current_weather(location, api_key, units='imperial'):
     }
 
 
+def cached_weather(location, api_key, units='imperial', cache=None):
+    """get_current_weather() through the TTL cache. Returns (weather, served_from_cache)."""
+    cache = cache or get_weather_cache()
+    # "Syracuse,  NY" and "syracuse, ny" are the same lookup
+    key = (' '.join(location.lower().split()), units)
+    return cache.get_or_compute(
+        key, lambda: get_current_weather(location, api_key, units)
+    )
+
+
 # ── Tool definition for OpenAI function calling ────────────────────
 weather_tool = {
     "type": "function",
@@ -55,8 +81,31 @@ weather_tool = {
 
 
 # ── Run the conversation with tool use ─────────────────────────────
+# Upper bound on model ↔ tool round trips for one question
+MAX_TOOL_ROUNDS = 3
+
+
+def run_weather_tool_call(tool_call, api_key_weather, weather_cache):
+    """Execute one get_current_weather call.
+
+    Returns (tool message for the model, weather dict or None, served_from_cache).
+    Errors go back to the model as the tool result instead of failing the whole answer.
+    """
+    args = json.loads(tool_call.function.arguments)
+    location = args.get("location", "Syracuse, NY, US")
+    try:
+        weather, from_cache = cached_weather(location, api_key_weather, cache=weather_cache)
+        content = json.dumps(weather)
+    except Exception as e:
+        weather, from_cache = None, False
+        content = json.dumps({"location": location, "error": str(e)})
+    return {"role": "tool", "tool_call_id": tool_call.id, "content": content}, weather, from_cache
+
+
 def get_clothing_advice(user_input, api_key_weather):
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    """Returns (advice, list of (weather, served_from_cache) for every location looked up)."""
+    client = get_openai_client()
+    weather_cache = get_weather_cache()
 
     messages = [
         {
@@ -64,7 +113,8 @@ def get_clothing_advice(user_input, api_key_weather):
             "content": (
                 "You are a helpful fashion and weather advisor. "
                 "When the user asks what to wear, use the get_current_weather tool "
-                "to look up the weather. Then, based on the weather data:\n"
+                "to look up the weather. If they ask about several places, call the tool "
+                "for every place in the same turn. Then, based on the weather data:\n"
                 "1. Suggest appropriate clothes to wear today.\n"
                 "2. Suggest outdoor activities that are appropriate for the current weather.\n"
                 "Keep your response practical, specific, and friendly."
@@ -73,43 +123,33 @@ def get_clothing_advice(user_input, api_key_weather):
         {"role": "user", "content": user_input},
     ]
 
-    # First call – the model may request a tool call
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        tools=[weather_tool],
-        tool_choice="auto",
-        max_tokens=400,
-    )
-
-    msg = response.choices[0].message
-
-    # If the model invoked the tool, execute it and send the result back
-    if msg.tool_calls:
-        tool_call = msg.tool_calls[0]
-        args = json.loads(tool_call.function.arguments)
-        location = args.get("location", "Syracuse, NY, US")
-        weather = get_current_weather(location, api_key_weather)
-
-        messages.append(msg)                       # assistant's tool‑call message
-        messages.append({                          # tool result
-            "role": "tool",
-            "tool_call_id": tool_call.id,
-            "content": json.dumps(weather),
-        })
-
-        # Second call – model produces the final advice
+    weather_results = []
+    for round_number in range(MAX_TOOL_ROUNDS + 1):
+        # on the last round, don't allow more tool calls so we always get an answer
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
             tools=[weather_tool],
-            tool_choice="auto",
+            tool_choice="auto" if round_number < MAX_TOOL_ROUNDS else "none",
             max_tokens=400,
         )
-        return response.choices[0].message.content, weather
+        msg = response.choices[0].message
+        if not msg.tool_calls:
+            return msg.content, weather_results
+
+        # Run every tool call from this turn at the same time, then send all results back together
+        messages.append(msg)                       # assistant's tool-call message
+        with ThreadPoolExecutor(max_workers=len(msg.tool_calls)) as pool:
+            results = list(pool.map(
+                lambda tool_call: run_weather_tool_call(tool_call, api_key_weather, weather_cache),
+                msg.tool_calls,
+            ))
+        for tool_message, weather, from_cache in results:
+            messages.append(tool_message)          # tool results, in call order
+            if weather:
+                weather_results.append((weather, from_cache))
 
-    # If no tool call was made, just return the text
-    return msg.content, None
+    return msg.content, weather_results
 
 
 # ── Streamlit UI ────────────────────────────────────────────────────
@@ -117,24 +157,31 @@ st.title("Lab 5 – What to Wear")
 
 api_key_weather = st.secrets["OPEN_WEATHER_API_KEY"]
 
-location = st.text_input("Enter a city (e.g., Syracuse, NY, US):")
+location = st.text_input("Enter a city, or several (e.g., Syracuse, NY, US and Boston, MA, US):")
 
 if st.button("Get Advice") and location:
     with st.spinner("Fetching weather and generating advice..."):
         try:
             prompt = f"What should I wear today in {location}?"
-            advice, weather = get_clothing_advice(prompt, api_key_weather)
+            advice, weather_results = get_clothing_advice(prompt, api_key_weather)
 
-            if weather:
+            for weather, from_cache in weather_results:
                 st.subheader(f"📍 {weather['location']}")
                 st.write(f"**Temperature:** {weather['temperature']} °F")
                 st.write(f"**Feels Like:** {weather['feels_like']} °F")
                 st.write(f"**Min / Max:** {weather['temp_min']} °F / {weather['temp_max']} °F")
                 st.write(f"**Humidity:** {weather['humidity']}%")
+                if from_cache:
+                    st.caption("Weather served from cache (fetched within the last 10 minutes).")
                 st.divider()
 
             st.subheader("👕 What to Wear")
             st.write(advice)
 
         except Exception as e:
-            st.error(f"Error: {e}")
\ No newline at end of file
+            st.error(f"Error: {e}")
+
+cache_stats = get_weather_cache().stats()
+st.sidebar.caption(
+    f"Weather cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses"
+)
\ No newline at end of file
@@ -1,12 +1,12 @@
 import streamlit as st
-from openai import OpenAI
+from lab_utils.resources import get_openai_client
 from pydantic import BaseModel
 
 # --- Page Config ---
 st.set_page_config(page_title="Research Agent", page_icon="🔍", layout="centered")
 
 # --- OpenAI Client Setup (Part A, Step 2) ---
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+client = get_openai_client()
 
 # --- Session State Initialization ---
 if "last_response_id" not in st.session_state:
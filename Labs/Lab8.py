@@ -1,18 +1,24 @@
 import streamlit as st
-from openai import OpenAI
-import requests
-import base64
+from lab_utils.resources import get_openai_client
+from lab_utils.image_prep import prepare_image
+from lab_utils.caption_cache import CaptionCache, perceptual_hash, url_key
+from lab_utils.http_fetch import fetch_url
+from lab_utils.captioning import CAPTION_PROMPT, request_caption, caption_many
+import json
 
 # --- OpenAI Client ---
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-
-# --- Shared prompt ---
-CAPTION_PROMPT = (
-    "Describe the image in at least 3 sentences. "
-    "Write five different captions for this image. "
-    "Captions must vary in length, minimum one word but be no longer than 2 sentences. "
-    "Captions should vary in tone, such as, but not limited to funny, intellectual, and aesthetic."
-)
+client = get_openai_client()
+
+@st.cache_resource
+def get_caption_cache():
+    """One caption cache per process, shared by every session."""
+    return CaptionCache()
+
+caption_cache = get_caption_cache()
+
+def caption_image(image_url, detail):
+    """Ask the vision model for the description and captions of one image."""
+    return request_caption(client, MODEL, image_url, detail)
 
 st.title("📸 Image Captioning Bot")
 st.write("Upload an image or paste a URL to get a description and creative captions.")
@@ -38,18 +44,17 @@ url = st.text_input("Paste an image URL:")
 
 if st.button("Generate Captions from URL") and url:
     with st.spinner("Analyzing image from URL..."):
-        response = client.chat.completions.create(
-            model=MODEL,
-            max_tokens=1024,
-            messages=[{
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": url, "detail": "auto"}},
-                    {"type": "text", "text": CAPTION_PROMPT}
-                ]
-            }]
-        )
-        st.session_state.url_response = response.choices[0].message.content
+        # key on the URL plus the image bytes, so a changed image at the same URL is captioned again
+        fetched = fetch_url(url)
+        key = url_key(url, fetched.content) if fetched.content else None
+        cached = caption_cache.get(MODEL, CAPTION_PROMPT, exact_key=key) if key else None
+        if cached:
+            st.caption("Served from the caption cache.")
+            st.session_state.url_response = cached
+        else:
+            st.session_state.url_response = caption_image(url, "auto")
+            if key:
+                caption_cache.put(MODEL, CAPTION_PROMPT, st.session_state.url_response, exact_key=key)
 
 if st.session_state.url_response:
     st.image(url, caption="Submitted Image", use_container_width=True)
@@ -72,24 +77,63 @@ uploaded = st.file_uploader(
 
 if st.button("Generate Captions from Upload") and uploaded:
     with st.spinner("Analyzing uploaded image..."):
-        b64 = base64.b64encode(uploaded.read()).decode("utf-8")
-        mime = uploaded.type
-        data_uri = f"data:{mime};base64,{b64}"
-
-        response = client.chat.completions.create(
-            model=MODEL,
-            max_tokens=1024,
-            messages=[{
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": data_uri, "detail": "low"}},
-                    {"type": "text", "text": CAPTION_PROMPT}
-                ]
-            }]
-        )
-        st.session_state.upload_response = response.choices[0].message.content
+        # resized or re-saved copies of an image have (nearly) the same perceptual hash
+        phash = perceptual_hash(uploaded.getvalue())
+        cached = caption_cache.get(MODEL, CAPTION_PROMPT, phash=phash)
+        if cached:
+            st.caption("Served from the caption cache.")
+            st.session_state.upload_response = cached
+        else:
+            # shrink to what "low" detail actually uses before uploading
+            prepared = prepare_image(uploaded.getvalue(), detail="low", original_mime=uploaded.type)
+            st.caption(
+                f"Sent a {prepared.width}×{prepared.height} {prepared.mime} image: "
+                f"{prepared.original_bytes / 1024:,.0f} KB → {len(prepared.data) / 1024:,.0f} KB "
+                f"({max(prepared.saved_bytes, 0) / prepared.original_bytes:.0%} smaller)"
+            )
+            st.session_state.upload_response = caption_image(prepared.data_uri, "low")
+            caption_cache.put(MODEL, CAPTION_PROMPT, st.session_state.upload_response, phash=phash)
 
 if st.session_state.upload_response:
     if uploaded:
         st.image(uploaded, caption="Uploaded Image", use_container_width=True)
-    st.write(st.session_state.upload_response)
\ No newline at end of file
+    st.write(st.session_state.upload_response)
+
+st.divider()
+
+# =====================
+# PART C: Batch Captioning
+# =====================
+st.header("Option 3: Caption Many Images")
+st.caption("Images are captioned several at a time; results appear as they finish.")
+
+BATCH_WORKERS = st.sidebar.slider("Batch concurrency", 1, 16, 8)
+
+batch = st.file_uploader(
+    "Choose image files",
+    type=["jpg", "jpeg", "png", "webp", "gif"],
+    accept_multiple_files=True,
+    key="batch_upload",
+)
+
+if st.button("Caption All") and batch:
+    progress = st.progress(0.0, text=f"Captioned 0 of {len(batch)} images")
+    images = [(f.name, f.getvalue(), f.type) for f in batch]
+    results = []
+    for result in caption_many(client, MODEL, images, max_workers=BATCH_WORKERS, cache=caption_cache):
+        results.append(result)
+        progress.progress(len(results) / len(images), text=f"Captioned {len(results)} of {len(images)} images")
+        with st.expander(result["name"] + (" (cached)" if result["cached"] else "")):
+            if "error" in result:
+                st.error(result["error"])
+            else:
+                st.write(result["caption"])
+    st.session_state.batch_results = results
+
+if st.session_state.get("batch_results"):
+    st.download_button(
+        "Download captions (JSONL)",
+        data="\n".join(json.dumps(result) for result in st.session_state.batch_results) + "\n",
+        file_name="captions.jsonl",
+        mime="application/json",
+    )
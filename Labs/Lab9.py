@@ -1,10 +1,12 @@
 import streamlit as st
-from openai import OpenAI
-import json
-import os
+from lab_utils.resources import get_openai_client
+from lab_utils.conversation import ConversationBuffer
+from lab_utils.memory_store import MemoryStore
+from lab_utils.embedding_cache import embedding_cache
+from lab_utils.memory_worker import MemoryExtractionWorker
 
 # --- API Client ---
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+client = get_openai_client()
 
 # --- Page Title ---
 st.title("🧠 Chatbot with Long-Term Memory")
@@ -13,32 +15,53 @@ st.title("🧠 Chatbot with Long-Term Memory")
 # PART B: Memory System
 # =====================
 
-MEMORY_FILE = "memories.json"
+# memories used to live in one shared JSON file; it is imported once into the default profile
+LEGACY_MEMORY_FILE = "memories.json"
+MEMORY_DB = "memories.sqlite3"
 
-def load_memories():
-    """Load memories from JSON file. Returns empty list if file doesn't exist."""
-    if os.path.exists(MEMORY_FILE):
-        with open(MEMORY_FILE, "r") as f:
-            return json.load(f)
-    return []
+@st.cache_resource
+def get_memory_store():
+    """One SQLite-backed store per process, shared by every session."""
+    store = MemoryStore(MEMORY_DB)
+    store.import_json_once(LEGACY_MEMORY_FILE, "default")
+    return store
 
-def save_memories(memories):
-    """Save a list of memories to the JSON file."""
-    with open(MEMORY_FILE, "w") as f:
-        json.dump(memories, f, indent=2)
+memory_store = get_memory_store()
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# at most this many memories (plus pinned ones), within this many tokens, go into each prompt
+MEMORY_TOP_K = 8
+MEMORY_TOKEN_BUDGET = 300
+# the sidebar only lists the newest memories
+SIDEBAR_MEMORIES = 20
+
+def embed_or_none(texts, openai_client=client):
+    """Embeddings for texts, or None if the embedding call fails (memories still work lexically)."""
+    try:
+        return embedding_cache.embed(openai_client, texts, EMBEDDING_MODEL)
+    except Exception:
+        return None
+
+@st.cache_resource
+def get_memory_worker():
+    """Background thread that extracts memories from finished exchanges, shared by all sessions."""
+    return MemoryExtractionWorker(
+        memory_store,
+        lambda openai_client, texts: embed_or_none(texts, openai_client),
+    )
+
+memory_worker = get_memory_worker()
 
 # --- Sidebar: Display Memories ---
 st.sidebar.header("🧠 Long-Term Memories")
-memories = load_memories()
+# each profile has its own memories
+user_id = st.sidebar.text_input("Memory profile", value="default").strip() or "default"
 
-if memories:
-    for i, memory in enumerate(memories, 1):
-        st.sidebar.write(f"{i}. {memory}")
-else:
-    st.sidebar.write("No memories yet. Start chatting!")
+# filled in at the end of the script, once this run's exchange has been handed to the worker
+memories_slot = st.sidebar.container()
 
 if st.sidebar.button("🗑️ Clear All Memories"):
-    save_memories([])
+    memory_store.clear(user_id)
     st.rerun()
 
 # =====================
@@ -53,8 +76,11 @@ model = st.sidebar.selectbox(
 )
 
 # --- Initialize Chat History ---
+# only the newest messages that fit this many tokens are sent to the model
+TOKEN_BUDGET = 3000
+
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = ConversationBuffer(model=model)
 
 # --- Display Chat History ---
 for message in st.session_state.messages:
@@ -69,7 +95,15 @@ if user_input := st.chat_input("Say something..."):
     st.session_state.messages.append({"role": "user", "content": user_input})
 
     # --- Build system prompt with memories injected ---
-    memories = load_memories()
+    # only pinned memories and the ones relevant to this message are sent
+    query_vector = embed_or_none([user_input])
+    memories = memory_store.relevant(
+        user_id,
+        user_input,
+        query_vector[0] if query_vector else None,
+        k=MEMORY_TOP_K,
+        token_budget=MEMORY_TOKEN_BUDGET,
+    )
     system_prompt = "You are a friendly and helpful assistant with long-term memory."
     if memories:
         memory_text = "\n".join(f"- {m}" for m in memories)
@@ -81,7 +115,8 @@ if user_input := st.chat_input("Say something..."):
 
     # --- Build messages for LLM ---
     llm_messages = [{"role": "system", "content": system_prompt}]
-    llm_messages += st.session_state.messages
+    recent_messages, _ = st.session_state.messages.select(TOKEN_BUDGET)
+    llm_messages += recent_messages
 
     # --- Get LLM Response ---
     with st.chat_message("assistant"):
@@ -95,32 +130,37 @@ if user_input := st.chat_input("Say something..."):
     st.session_state.messages.append({"role": "assistant", "content": response})
 
     # --- Extract New Memories ---
-    extraction_prompt = f"""Analyze the following conversation exchange and extract any new facts about the user worth remembering (e.g., name, preferences, interests, location, major, hobbies, etc.).
-
-User said: "{user_input}"
-Assistant replied: "{response}"
-
-Here are the memories already saved (do NOT duplicate these):
-{json.dumps(memories)}
-
-Return ONLY a JSON list of new facts as strings. If there are no new facts, return an empty list [].
-Example: ["User's name is Alice", "User likes hiking"]
-Do not include any other text, just the JSON list."""
-
-    try:
-        extraction_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": extraction_prompt}],
+    # handed to the background worker; the sidebar picks up the results when they're stored
+    memory_worker.submit(client, user_id, user_input, response, memories)
+
+# --- Sidebar: Memory List ---
+# re-runs on its own every few seconds, but only while extraction is pending for this profile
+@st.fragment(run_every=3 if memory_worker.pending(user_id) else None)
+def show_memories():
+    memory_records = memory_store.records(user_id)
+    if memory_worker.pending(user_id):
+        st.caption("⏳ Extracting memories from the latest messages...")
+        st.session_state.lab9_extraction_seen = True
+    elif st.session_state.pop("lab9_extraction_seen", False):
+        # extraction finished: re-run the page once so the polling stops
+        st.rerun()
+
+    if memory_records:
+        st.caption(
+            f"{len(memory_records)} memories. Tick a memory to pin it: pinned memories are "
+            f"always used, the rest only when relevant to your message."
         )
-        new_facts_text = extraction_response.choices[0].message.content.strip()
-        # Clean potential markdown code fences
-        new_facts_text = new_facts_text.replace("```json", "").replace("```", "").strip()
-        new_facts = json.loads(new_facts_text)
-
-        if new_facts and isinstance(new_facts, list):
-            memories.extend(new_facts)
-            save_memories(memories)
-            st.rerun()
-    except (json.JSONDecodeError, Exception) as e:
-        # Silently handle parsing errors — memory extraction is best-effort
-        pass
\ No newline at end of file
+        shown = memory_records[-SIDEBAR_MEMORIES:]
+        first_number = len(memory_records) - len(shown) + 1
+        for i, (memory_id, memory, pinned) in enumerate(shown, first_number):
+            st.checkbox(
+                f"{i}. {memory}",
+                value=pinned,
+                key=f"pin_{user_id}_{memory_id}",
+                on_change=lambda memory_id=memory_id, pinned=pinned: memory_store.set_pinned(user_id, memory_id, not pinned),
+            )
+    else:
+        st.write("No memories yet. Start chatting!")
+
+with memories_slot:
+    show_memories()
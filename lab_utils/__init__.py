@@ -0,0 +1 @@
+"""Helpers shared by the pages in Labs/."""
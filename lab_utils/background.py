@@ -0,0 +1,71 @@
+"""Run slow setup work (e.g. indexing documents) off the script thread.
+
+A page starts the job once and keeps rendering; the job's progress fields
+can be read from any rerun (see Lab4's st.fragment that polls them).
+Starting a job that is already running does nothing.
+"""
+import threading
+import time
+
+
+class BackgroundJob:
+    """Runs target(*args, progress=callback) in a daemon thread.
+
+    The target calls progress(done, total, message) as it goes. Once it
+    returns, result holds its return value (or error the exception text).
+    """
+
+    def __init__(self, target, name=None):
+        self.target = target
+        self.name = name or getattr(target, "__name__", "background-job")
+        self._lock = threading.Lock()
+        self._thread = None
+        self.status = "idle"        # idle | running | done | failed
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.seconds = None         # how long the last run took
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def start(self, *args):
+        """Start a run unless one is in progress. Returns True if a new run started."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.status = "running"
+            self.done, self.total, self.message = 0, 0, "Starting..."
+            self.error = None
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, args=args, name=self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        """Block until the current run finishes (or timeout seconds pass)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.running
+
+    def progress(self, done, total, message=""):
+        self.done, self.total, self.message = done, total, message
+
+    def _run(self, *args):
+        try:
+            self.result = self.target(*args, progress=self.progress)
+            self.status = "done"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+        finally:
+            self.seconds = time.perf_counter() - self.started_at
@@ -0,0 +1,55 @@
+"""Command-line batch captioning over a directory of images.
+
+    python -m lab_utils.batch_caption photos/ --out captions.jsonl --workers 8
+
+Reads OPENAI_API_KEY from the environment and writes one JSON line per
+image as soon as its caption arrives.
+"""
+import argparse
+import json
+import mimetypes
+import os
+import sys
+from pathlib import Path
+
+from openai import OpenAI
+
+from lab_utils.caption_cache import CaptionCache
+from lab_utils.captioning import DEFAULT_WORKERS, caption_many
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+
+def iter_images(directory):
+    for path in sorted(Path(directory).rglob("*")):
+        if path.suffix.lower() in IMAGE_SUFFIXES and path.is_file():
+            yield str(path), path.read_bytes(), mimetypes.guess_type(path.name)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caption every image in a directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--out", default="captions.jsonl", help="JSONL file to write")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent requests")
+    parser.add_argument("--no-cache", action="store_true", help="don't use the caption cache")
+    args = parser.parse_args(argv)
+
+    client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    cache = None if args.no_cache else CaptionCache()
+    done = failed = 0
+    with open(args.out, "w") as out:
+        for result in caption_many(client, args.model, iter_images(args.directory),
+                                   max_workers=args.workers, cache=cache):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            done += 1
+            failed += "error" in result
+            print(f"[{done}] {result['name']} ({result['seconds']}s)"
+                  + (f" ERROR: {result['error']}" if "error" in result else ""), file=sys.stderr)
+    print(f"Captioned {done - failed} of {done} images -> {args.out}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+"""Offline micro-benchmarks for the CPU-bound paths the labs run locally.
+
+    python -m lab_utils.benchmarks                    # run and compare with the baseline
+    python -m lab_utils.benchmarks --save-baseline    # record new baseline numbers
+    python -m lab_utils.benchmarks -k memory --json
+
+Covers PDF text extraction (Lab2/Lab4), token counting and history
+trimming (Lab3/Lab4/Lab9), HTML-to-text for URL context (Lab4), memory
+save/load (Lab9) and image shrinking + base64 encoding (Lab8). Inputs are
+synthetic, plus the PDFs in Lab-04-Data/ when that folder is present.
+
+Nothing touches the network. Token counting uses a word-level stand-in
+for tiktoken by default, so results don't depend on whether tiktoken's
+encoding files can be downloaded and every machine measures the same
+code. --tiktoken uses the real tokenizer; those token-based results are
+only compared with a baseline recorded the same way.
+
+Times are compared relative to a fixed pure-Python calibration workload,
+so a baseline recorded on one machine still means something on another.
+Each benchmark runs in blocks with a calibration run before every block,
+so both see the same machine state, and the whole suite is run --repeats
+times round-robin, so slow drifts between passes are measured too. A
+benchmark's relative time is the median over all its blocks of (best time
+in block / calibration time), and its noise is the median absolute
+deviation of those ratios. Every baseline entry keeps its own calibration
+and noise, so entries saved with -k stay comparable.
+
+A benchmark regresses when its relative time is above the baseline's by
+more than --tolerance or NOISE_FACTOR times the larger of the two noises,
+whichever is wider; the exit status is 1 if any did.
+"""
+import argparse
+import base64
+import hashlib
+import io
+import itertools
+import json
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from lab_utils import chunking, conversation, html_text
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "Lab-04-Data"
+DEFAULT_BASELINE = REPO_ROOT / "benchmarks" / "baseline.json"
+# smallest change reported, however quiet the measurements were
+DEFAULT_TOLERANCE = 0.10
+# changes within this many noise widths are not reported
+NOISE_FACTOR = 3
+# per pass, each benchmark runs for at least this long, in BLOCKS blocks
+MIN_SECONDS = 0.5
+BLOCKS = 5
+REPEATS = 3
+
+WORDS = (
+    "course students data analysis python project assignment grade syllabus week "
+    "lecture model learning information technology society privacy ethics office hours "
+    "exam quiz reading discussion team presentation deadline policy"
+).split()
+
+
+class StubEncoding:
+    """Offline stand-in for a tiktoken encoding: one token per word or punctuation mark."""
+    _pattern = re.compile(r"\w+|[^\w\s]")
+
+    def __init__(self):
+        self._ids = {}
+        self._words = []
+
+    def encode(self, text):
+        tokens = []
+        for word in self._pattern.findall(text):
+            if word not in self._ids:
+                self._ids[word] = len(self._words)
+                self._words.append(word)
+            tokens.append(self._ids[word])
+        return tokens
+
+    def decode(self, tokens):
+        return " ".join(self._words[token] for token in tokens)
+
+
+def use_stub_tokenizer():
+    """Make every lab_utils token count go through StubEncoding."""
+    stub = StubEncoding()
+    chunking.get_chunk_encoding = lambda: stub
+    html_text.get_chunk_encoding = lambda: stub
+    conversation.get_encoding = lambda model: stub
+    return "stub"
+
+
+def use_offline_tokenizer():
+    """Load the real tokenizer, or swap in StubEncoding if it can't be loaded offline.
+
+    Returns the name of the tokenizer in use ("tiktoken" or "stub").
+    """
+    try:
+        chunking.get_chunk_encoding()
+        conversation.get_encoding("gpt-4o-mini")
+        return "tiktoken"
+    except Exception:
+        return use_stub_tokenizer()
+
+
+def synthetic_text(words, seed=0):
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 18))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def synthetic_conversation(messages=400):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": synthetic_text(20 + i % 60, seed=i)}
+        for i in range(messages)
+    ]
+
+
+def synthetic_html(paragraphs=400):
+    nav = "".join(f"<li><a href='/p{i}'>Link {i}</a></li>" for i in range(200))
+    body = "".join(f"<h2>Section {i}</h2><p>{synthetic_text(60, seed=i)}</p>" for i in range(paragraphs))
+    return (
+        "<html><head><title>Course page</title><style>body {margin: 0}</style>"
+        "<script>var tracking = 1;</script></head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<main><article>{body}</article></main>"
+        "<footer><p>Copyright</p></footer></body></html>"
+    )
+
+
+def synthetic_image(width=2400, height=1800):
+    """A photo-sized PNG: noise over a gradient, so it doesn't compress to nothing."""
+    from PIL import Image
+
+    noise = Image.effect_noise((width, height), 48)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    image = Image.merge("RGB", (gradient, noise, gradient.rotate(90, expand=False)))
+    output = io.BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+
+# ── benchmarks ──────────────────────────────────────────────────────
+# Each one takes an ExitStack (for temporary files), does its setup, and returns the function to time.
+
+def bench_pdf_extract(stack):
+    from lab_utils.pdf_extract import extract_text_from_pdf
+
+    pdfs = [path.read_bytes() for path in sorted(DATA_DIR.glob("*.pdf"))]
+    if not pdfs:
+        return None
+    return lambda: [extract_text_from_pdf(data) for data in pdfs]
+
+
+def bench_count_tokens(stack):
+    messages = synthetic_conversation(200)
+    return lambda: conversation.count_tokens(messages)
+
+
+def bench_history_select(stack):
+    messages = synthetic_conversation(400)
+
+    def run():
+        # what a chat page does per turn: append the new messages, then trim to the budget
+        buffer = conversation.ConversationBuffer(pinned=[{"role": "assistant", "content": "How can I help you?"}])
+        for message in messages:
+            buffer.append(message)
+        for _ in range(50):
+            buffer.select(2000)
+    return run
+
+
+def bench_html_to_text(stack):
+    html = synthetic_html()
+    # page_text() caches by content hash, so time the uncached work it does
+    return lambda: html_text.trim_to_tokens(html_text.extract_main_text(html), 1500)
+
+
+# shared by every pass, so later passes get new facts too
+_memory_rounds = itertools.count()
+
+
+def bench_memory_save(stack):
+    from lab_utils.memory_store import MemoryStore
+
+    workdir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="bench-memory-")))
+
+    def run():
+        # new facts every round, so nothing computed for earlier rounds (or passes) can be reused
+        round_number = next(_memory_rounds)
+        facts = [synthetic_text(12, seed=round_number * 1000 + i) for i in range(200)]
+        store = MemoryStore(workdir / f"save-{round_number}.sqlite3")
+        for start in range(0, len(facts), 5):
+            store.add("bench", facts[start:start + 5])
+    return run
+
+
+def bench_memory_load(stack):
+    from lab_utils.memory_store import MemoryStore
+
+    db_path = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="bench-memory-"))) / "load.sqlite3"
+    MemoryStore(db_path).add("bench", [synthetic_text(12, seed=i) for i in range(500)])
+    return lambda: MemoryStore(db_path).records("bench")
+
+
+def bench_image_encode(stack):
+    from lab_utils.image_prep import prepare_image
+
+    data = synthetic_image()
+    return lambda: prepare_image(data, detail="low", original_mime="image/png")
+
+
+def bench_base64_encode(stack):
+    data = random.Random(0).randbytes(4 * 1024 * 1024)
+    return lambda: f"data:image/png;base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+BENCHMARKS = {
+    "pdf_extract": bench_pdf_extract,
+    "count_tokens": bench_count_tokens,
+    "history_select": bench_history_select,
+    "html_to_text": bench_html_to_text,
+    "memory_save": bench_memory_save,
+    "memory_load": bench_memory_load,
+    "image_encode": bench_image_encode,
+    "base64_encode": bench_base64_encode,
+}
+# results that depend on which tokenizer was used
+TOKENIZER_DEPENDENT = {"count_tokens", "history_select", "html_to_text"}
+
+
+def calibration_workload():
+    """Fixed mix of hashing, sorting and dict work that no lab_utils change can affect."""
+    rng = random.Random(0)
+    values = [rng.random() for _ in range(20000)]
+    counts = {}
+    for value in sorted(values):
+        key = hashlib.sha256(str(value).encode("utf-8")).hexdigest()[:2]
+        counts[key] = counts.get(key, 0) + 1
+    return json.dumps(counts)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def time_interleaved(func, min_seconds=MIN_SECONDS, blocks=BLOCKS):
+    """Time func in blocks, each preceded by one calibration run.
+
+    Returns (timings, calibrations, ratios): every call's time, each
+    block's calibration time, and each block's best time / calibration.
+    """
+    func()  # warm-up: imports, lazy caches
+    calibration_workload()
+    block_seconds = min_seconds / blocks
+    timings, calibrations, ratios = [], [], []
+    for _ in range(blocks):
+        calibration = _timed(calibration_workload)
+        block = [_timed(func)]
+        while sum(block) < block_seconds:
+            block.append(_timed(func))
+        timings += block
+        calibrations.append(calibration)
+        ratios.append(min(block) / calibration)
+    return timings, calibrations, ratios
+
+
+def run_benchmarks(names, min_seconds=MIN_SECONDS, repeats=REPEATS):
+    samples = {name: ([], [], []) for name in names}
+    skipped = set()
+    for _ in range(repeats):
+        for name in names:
+            if name in skipped:
+                continue
+            with ExitStack() as stack:
+                func = BENCHMARKS[name](stack)
+                if func is None:
+                    skipped.add(name)
+                    continue
+                for pooled, new in zip(samples[name], time_interleaved(func, min_seconds)):
+                    pooled += new
+
+    results = {}
+    for name, (timings, calibrations, ratios) in samples.items():
+        if name in skipped:
+            results[name] = {"skipped": "no input data"}
+            continue
+        relative = statistics.median(ratios)
+        results[name] = {
+            "median": statistics.median(timings),
+            "min": min(timings),
+            "calibration": statistics.median(calibrations),
+            "relative": relative,
+            "noise": statistics.median(abs(ratio - relative) for ratio in ratios) / relative,
+            "rounds": len(timings),
+        }
+    return results
+
+
+def allowed_change(result, reference, tolerance=DEFAULT_TOLERANCE):
+    """How far result's relative time may move from reference's before it is reported."""
+    return max(tolerance, NOISE_FACTOR * max(result.get("noise", 0.0), reference.get("noise", 0.0)))
+
+
+def compare(results, baseline, tokenizer, tolerance=DEFAULT_TOLERANCE):
+    """Returns {name: status} where status is 'ok', 'faster', 'REGRESSED', 'skipped' or 'new'."""
+    statuses = {}
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if "skipped" in result:
+            statuses[name] = "skipped"
+        elif reference is None or "relative" not in reference:
+            statuses[name] = "new"
+        elif name in TOKENIZER_DEPENDENT and baseline.get("tokenizer") != tokenizer:
+            statuses[name] = "skipped"  # not comparable with the tokenizer the baseline used
+        else:
+            allowed = allowed_change(result, reference, tolerance)
+            if result["relative"] > reference["relative"] * (1 + allowed):
+                statuses[name] = "REGRESSED"
+            elif result["relative"] < reference["relative"] * (1 - allowed):
+                statuses[name] = "faster"
+            else:
+                statuses[name] = "ok"
+    return statuses
+
+
+def format_table(results, baseline, statuses):
+    lines = [
+        f"{'benchmark':<16} {'median':>10} {'min':>10} {'relative':>9} {'baseline':>9} {'change':>8} {'allowed':>8}  status"
+    ]
+    for name, result in results.items():
+        if "skipped" in result:
+            lines.append(f"{name:<16} {'':>10} {'':>10} {'':>9} {'':>9} {'':>8} {'':>8}  skipped ({result['skipped']})")
+            continue
+        reference = baseline.get("results", {}).get(name, {})
+        if "relative" in reference:
+            baseline_relative = f"{reference['relative']:.2f}"
+            change = f"{result['relative'] / reference['relative'] - 1:+.0%}"
+            allowed = f"±{allowed_change(result, reference):.0%}"
+        else:
+            baseline_relative = change = allowed = ""
+        lines.append(
+            f"{name:<16} {result['median'] * 1000:>8.2f}ms {result['min'] * 1000:>8.2f}ms "
+            f"{result['relative']:>9.2f} {baseline_relative:>9} {change:>8} {allowed:>8}  {statuses[name]}"
+        )
+    lines.append("(relative = best time / calibration workload time, measured interleaved on the same machine)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline micro-benchmarks.")
+    parser.add_argument("-k", dest="select", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="smallest slowdown that counts as a regression (0.1 = 10%%); "
+                             "noisy benchmarks get a wider band")
+    parser.add_argument("--min-seconds", type=float, default=MIN_SECONDS, help="minimum time per benchmark per pass")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="passes over the selected benchmarks")
+    parser.add_argument("--tiktoken", action="store_true",
+                        help="count tokens with tiktoken (when its encodings can be loaded) instead of the stand-in")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if not args.select or args.select in name]
+    tokenizer = use_offline_tokenizer() if args.tiktoken else use_stub_tokenizer()
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    partial = len(names) < len(BENCHMARKS)
+    if args.save_baseline and partial and baseline.get("tokenizer", tokenizer) != tokenizer:
+        # kept entries were measured with the other tokenizer; a merged file would mislabel them
+        parser.error(f"the baseline was recorded with the {baseline['tokenizer']} tokenizer; "
+                     f"re-record all benchmarks (no -k) to switch it to {tokenizer}")
+    results = run_benchmarks(names, args.min_seconds, args.repeats)
+
+    if args.save_baseline:
+        merged = dict(baseline.get("results", {}), **results) if partial else results
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            "tokenizer": tokenizer,
+            "python": sys.version.split()[0],
+            "results": merged,
+        }, indent=2) + "\n")
+        print(f"Saved baseline for {len(results)} benchmarks to {args.baseline}", file=sys.stderr)
+        baseline = {}
+
+    statuses = compare(results, baseline, tokenizer, args.tolerance)
+    if args.json:
+        print(json.dumps({"tokenizer": tokenizer, "results": results, "status": statuses}, indent=2))
+    else:
+        print(f"tokenizer: {tokenizer}")
+        print(format_table(results, baseline, statuses))
+    return 1 if "REGRESSED" in statuses.values() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
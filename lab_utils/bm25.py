@@ -0,0 +1,141 @@
+"""A small in-memory BM25 index with reciprocal-rank fusion helpers.
+
+Lab4 keeps one of these next to its Chroma collection so that exact terms
+(course codes, instructor names) can be matched lexically, and so that
+clearly lexical questions can skip the embedding call altogether.
+The index is shared across sessions and updated from Lab4's indexing
+thread, so every method holds the index's lock.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "tell",
+    "that", "the", "this", "to", "what", "when", "where", "which", "who", "why",
+    "will", "with", "you", "about",
+}
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}                       # id -> {"text", "metadata"}
+        self._term_freqs = {}                # id -> Counter of terms
+        self._lengths = {}                   # id -> number of terms
+        self._postings = defaultdict(set)    # term -> ids containing it
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def get(self, doc_id):
+        """The {"text", "metadata"} dict for doc_id, or None if it isn't (or is no longer) indexed."""
+        with self._lock:
+            return self.docs.get(doc_id)
+
+    def add(self, doc_id, text, metadata=None):
+        terms = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self.docs:
+                self.remove([doc_id])
+            self.docs[doc_id] = {"text": text, "metadata": metadata or {}}
+            self._term_freqs[doc_id] = terms
+            self._lengths[doc_id] = sum(terms.values())
+            self._total_length += self._lengths[doc_id]
+            for term in terms:
+                self._postings[term].add(doc_id)
+
+    def remove(self, doc_ids):
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id not in self.docs:
+                    continue
+                terms = self._term_freqs.pop(doc_id)
+                self._total_length -= self._lengths.pop(doc_id)
+                for term in terms:
+                    self._postings[term].discard(doc_id)
+                    if not self._postings[term]:
+                        del self._postings[term]
+                del self.docs[doc_id]
+
+    def search(self, query, k=5):
+        """Return up to k (doc_id, score) pairs, best first."""
+        query_terms = set(tokenize(query))
+        with self._lock:
+            return self._search(query_terms, k)
+
+    def _search(self, query_terms, k):
+        if not query_terms or not self.docs:
+            return []
+        doc_count = len(self.docs)
+        avg_length = self._total_length / doc_count or 1
+        scores = defaultdict(float)
+        for term in query_terms:
+            ids = self._postings.get(term)
+            if not ids:
+                continue
+            idf = math.log(1 + (doc_count - len(ids) + 0.5) / (len(ids) + 0.5))
+            for doc_id in ids:
+                tf = self._term_freqs[doc_id][term]
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def is_confident(self, query, results, margin=1.5):
+        """True when the top lexical hit contains every query term and clearly beats the runner-up.
+
+        Used to answer with lexical results only and skip the embedding call.
+        """
+        query_terms = set(tokenize(query))
+        if not results or not query_terms:
+            return False
+        top_id, top_score = results[0]
+        with self._lock:
+            top_terms = self._term_freqs.get(top_id, {})
+        if not query_terms <= set(top_terms):
+            return False
+        if len(results) == 1:
+            return True
+        return top_score >= margin * results[1][1]
+
+    def save(self, path):
+        path = Path(path)
+        tmp_path = path.with_suffix(".tmp")
+        with self._lock, open(tmp_path, "w") as f:
+            json.dump(self.docs, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        path = Path(path)
+        if path.exists():
+            with open(path, "r") as f:
+                for doc_id, doc in json.load(f).items():
+                    index.add(doc_id, doc["text"], doc["metadata"])
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked lists of ids into one, best first.
+
+    Each id scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] += 1 / (k + rank)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
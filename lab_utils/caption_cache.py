@@ -0,0 +1,127 @@
+"""Caption cache for Lab8.
+
+Uploaded images are keyed by a 64-bit perceptual difference hash (dHash), so
+a resized or re-saved copy of an image finds the earlier caption as long
+as the hashes are within a small Hamming distance. Images given by URL are
+keyed exactly, by the URL plus a hash of the downloaded bytes. Every entry
+is also tied to the model and prompt that produced it. The least recently
+used entries are evicted once the cache holds more than max_entries.
+"""
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_DB_PATH = Path(".cache/captions.sqlite3")
+DEFAULT_MAX_ENTRIES = 5000
+# dHashes this close (out of 64 bits) count as the same picture
+HAMMING_THRESHOLD = 6
+
+
+def perceptual_hash(data):
+    """64-bit dHash: compare neighbouring pixels of a 9x8 grayscale thumbnail."""
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def url_key(url, data):
+    return hashlib.sha256(url.encode("utf-8") + b"\0" + hashlib.sha256(data).digest()).hexdigest()
+
+
+def _prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class CaptionCache:
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_entries=DEFAULT_MAX_ENTRIES,
+                 hamming_threshold=HAMMING_THRESHOLD):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.hamming_threshold = hamming_threshold
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._db is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS captions ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "model TEXT, prompt_hash TEXT, phash INTEGER, exact_key TEXT, "
+                    "caption TEXT, last_used REAL)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS captions_by_request ON captions (model, prompt_hash)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS captions_by_exact_key ON captions (exact_key)"
+                )
+        return self._db
+
+    def get(self, model, prompt, phash=None, exact_key=None):
+        """Cached caption for this image, model and prompt, or None."""
+        with self._lock:
+            db = self._connect()
+            found = None
+            if exact_key is not None:
+                found = db.execute(
+                    "SELECT id, caption FROM captions WHERE exact_key = ? AND model = ? AND prompt_hash = ?",
+                    (exact_key, model, _prompt_hash(prompt)),
+                ).fetchone()
+            elif phash is not None:
+                rows = db.execute(
+                    "SELECT id, caption, phash FROM captions "
+                    "WHERE model = ? AND prompt_hash = ? AND phash IS NOT NULL",
+                    (model, _prompt_hash(prompt)),
+                ).fetchall()
+                best_distance = self.hamming_threshold + 1
+                for row_id, caption, stored in rows:
+                    distance = ((stored & ((1 << 64) - 1)) ^ phash).bit_count()
+                    if distance < best_distance:
+                        found, best_distance = (row_id, caption), distance
+            if found is None:
+                self.misses += 1
+                return None
+            with db:
+                db.execute("UPDATE captions SET last_used = ? WHERE id = ?", (time.time(), found[0]))
+            self.hits += 1
+            return found[1]
+
+    def put(self, model, prompt, caption, phash=None, exact_key=None):
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute(
+                    "INSERT INTO captions (model, prompt_hash, phash, exact_key, caption, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (model, _prompt_hash(prompt), _to_signed(phash) if phash is not None else None,
+                     exact_key, caption, time.time()),
+                )
+                # evict the least recently used entries beyond max_entries
+                db.execute(
+                    "DELETE FROM captions WHERE id IN ("
+                    "SELECT id FROM captions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,94 @@
+"""Image captioning shared by Lab8's single-image and batch modes.
+
+caption_many() runs vision requests in a bounded thread pool and yields
+results as they complete, so throughput scales with the worker count.
+Transient API failures (rate limits, timeouts, 5xx) are retried with
+exponential backoff by the openai client (MAX_RETRIES times per request).
+See lab_utils/batch_caption.py for the command line.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from lab_utils.caption_cache import perceptual_hash
+from lab_utils.image_prep import prepare_image
+
+CAPTION_PROMPT = (
+    "Describe the image in at least 3 sentences. "
+    "Write five different captions for this image. "
+    "Captions must vary in length, minimum one word but be no longer than 2 sentences. "
+    "Captions should vary in tone, such as, but not limited to funny, intellectual, and aesthetic."
+)
+
+# retries after the first attempt; the SDK backs off exponentially between them
+MAX_RETRIES = 3
+DEFAULT_WORKERS = 8
+# images read ahead of the workers, per worker
+QUEUED_PER_WORKER = 2
+
+
+def request_caption(client, model, image_url, detail, prompt=CAPTION_PROMPT):
+    """One vision request. Transient errors are retried by the SDK itself."""
+    response = client.with_options(max_retries=MAX_RETRIES).chat.completions.create(
+        model=model,
+        max_tokens=1024,
+        messages=[{
+            "role": "user",
+            "content": [
+                {"type": "image_url", "image_url": {"url": image_url, "detail": detail}},
+                {"type": "text", "text": prompt}
+            ]
+        }]
+    )
+    return response.choices[0].message.content
+
+
+def caption_image_bytes(client, model, data, mime=None, cache=None, prompt=CAPTION_PROMPT):
+    """Caption raw image bytes: check the cache, otherwise shrink, send and cache.
+
+    Returns a result dict with the caption (or error) and whether it was cached.
+    """
+    phash = perceptual_hash(data)
+    cached = cache.get(model, prompt, phash=phash) if cache else None
+    if cached:
+        return {"caption": cached, "cached": True, "bytes_sent": 0}
+    prepared = prepare_image(data, detail="low", original_mime=mime)
+    caption = request_caption(client, model, prepared.data_uri, "low", prompt)
+    if cache:
+        cache.put(model, prompt, caption, phash=phash)
+    return {"caption": caption, "cached": False, "bytes_sent": len(prepared.data)}
+
+
+def caption_many(client, model, images, max_workers=DEFAULT_WORKERS, cache=None, prompt=CAPTION_PROMPT):
+    """Caption many images concurrently; yield result dicts in completion order.
+
+    images is an iterable of (name, bytes, mime) tuples. It is consumed
+    lazily: only a few images per worker are read ahead, so a generator
+    over a large directory never holds every file in memory. A failed
+    image yields a result with an "error" key instead of stopping the batch.
+    """
+    def work(name, data, mime):
+        started = time.perf_counter()
+        try:
+            result = caption_image_bytes(client, model, data, mime, cache, prompt)
+        except Exception as e:
+            result = {"caption": None, "error": str(e), "cached": False, "bytes_sent": 0}
+        result.update(name=name, model=model, seconds=round(time.perf_counter() - started, 3))
+        return result
+
+    images = iter(images)
+    max_queued = max_workers * QUEUED_PER_WORKER
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_queued:
+                image = next(images, None)
+                if image is None:
+                    exhausted = True
+                else:
+                    pending.add(pool.submit(work, *image))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
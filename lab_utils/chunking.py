@@ -0,0 +1,30 @@
+"""Token-window chunking shared by Lab1 and Lab4."""
+from functools import lru_cache
+
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP = 50
+
+
+@lru_cache(maxsize=None)
+def get_chunk_encoding():
+    # imported here so pages load without waiting for tiktoken
+    import tiktoken
+
+    # text-embedding-3-small uses the cl100k_base tokenizer
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_text_tokens(text):
+    return len(get_chunk_encoding().encode(text))
+
+
+def chunk_text(text, chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    """Split text into overlapping token windows. Yields (token_offset, chunk_text)."""
+    encoding = get_chunk_encoding()
+    tokens = encoding.encode(text)
+    step = chunk_tokens - overlap
+    for start in range(0, len(tokens), step):
+        window = tokens[start:start + chunk_tokens]
+        yield start, encoding.decode(window)
+        if start + chunk_tokens >= len(tokens):
+            break
@@ -0,0 +1,81 @@
+"""Token-aware chat history shared by Lab3, Lab4 and Lab9.
+
+Every message's token count is computed once, when it is appended, and the
+buffer keeps a running total. select() walks back from the newest message
+and stops at the first one that doesn't fit, so building the prompt for a
+turn costs O(messages sent) instead of re-encoding the whole history.
+"""
+from collections import deque
+from functools import lru_cache
+
+# every message costs a few tokens of framing on top of its content
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 2
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_message_tokens(message, model="gpt-4o-mini"):
+    encoding = get_encoding(model)
+    return TOKENS_PER_MESSAGE + sum(len(encoding.encode(value)) for value in message.values())
+
+
+def count_tokens(messages, model="gpt-4o-mini"):
+    """Count the total tokens in a list of messages."""
+    return sum(count_message_tokens(message, model) for message in messages) + TOKENS_PER_REPLY
+
+
+class ConversationBuffer:
+    """Chat history with cached per-message token counts.
+
+    pinned messages (e.g. the opening greeting) are always sent and don't
+    count against the budget passed to select().
+    """
+
+    def __init__(self, pinned=None, model="gpt-4o-mini"):
+        self.model = model
+        self.pinned = list(pinned or [])
+        self._messages = deque()   # (message, tokens), oldest first
+        self.total_tokens = 0
+
+    def append(self, message):
+        tokens = count_message_tokens(message, self.model)
+        self._messages.append((message, tokens))
+        self.total_tokens += tokens
+
+    def clear(self):
+        self._messages.clear()
+        self.total_tokens = 0
+
+    def __iter__(self):
+        """All messages, pinned first, for displaying the chat."""
+        yield from self.pinned
+        for message, _ in self._messages:
+            yield message
+
+    def __len__(self):
+        return len(self.pinned) + len(self._messages)
+
+    def select(self, token_budget):
+        """Return (pinned + newest messages that fit token_budget, tokens used by those messages).
+
+        The newest message (normally the question being asked) is always
+        included, even when it alone is over the budget.
+        """
+        selected = []
+        used = 0
+        for message, tokens in reversed(self._messages):
+            if selected and used + tokens > token_budget:
+                break
+            selected.append(message)
+            used += tokens
+        selected.reverse()
+        return self.pinned + selected, used
@@ -0,0 +1,132 @@
+"""Two-tier cache in front of client.embeddings.create.
+
+Tier 1 is an in-process LRU dict, tier 2 is a SQLite table on disk, so
+embeddings survive restarts. Keys are a hash of the model name and the
+whitespace-normalized text. embed() looks a whole batch up at once and
+only sends the misses to the API, in a single request.
+"""
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_DB_PATH = Path(".cache/embeddings.sqlite3")
+DEFAULT_MEMORY_ITEMS = 2048
+# SQLite limits how many ? parameters one query may have
+SQL_BATCH = 500
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, db_path=DEFAULT_DB_PATH, memory_items=DEFAULT_MEMORY_ITEMS):
+        self.db_path = Path(db_path)
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        # Streamlit serves sessions from several threads, so share one
+        # connection and guard everything with a lock
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._db is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+            )
+        return self._db
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys):
+        """Return {key: vector} for every key found in memory or on disk."""
+        found = {}
+        on_disk = []
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+            else:
+                on_disk.append(key)
+
+        on_disk = list(dict.fromkeys(on_disk))
+        db = self._connect()
+        for start in range(0, len(on_disk), SQL_BATCH):
+            batch = on_disk[start:start + SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+                self._remember(key, found[key])
+        return found, set(on_disk)
+
+    def _store(self, model, items):
+        db = self._connect()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(key, model, array("f", vector).tobytes()) for key, vector in items],
+            )
+        for key, vector in items:
+            self._remember(key, vector)
+
+    def embed(self, client, texts, model):
+        """Return one embedding per text, calling the API only for cache misses."""
+        keys = [cache_key(model, text) for text in texts]
+        with self._lock:
+            found, looked_up_on_disk = self._lookup(keys)
+
+        # one API call for all misses, each distinct text sent once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            response = client.embeddings.create(input=list(missing.values()), model=model)
+            vectors = [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+            new_items = list(zip(missing.keys(), vectors))
+            with self._lock:
+                self._store(model, new_items)
+            found.update(new_items)
+
+        with self._lock:
+            for key in keys:
+                if key in missing:
+                    self.misses += 1
+                elif key in looked_up_on_disk:
+                    self.disk_hits += 1
+                else:
+                    self.memory_hits += 1
+        return [found[key] for key in keys]
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+# one cache per process, shared by every session
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,70 @@
+"""Main-content text extraction for web pages used as chat context.
+
+Boilerplate (scripts, styles, navigation, headers, footers...) is dropped,
+the main content element is picked when the page marks one, and the text
+is trimmed to a token budget instead of a character count. lxml is used as
+the parser when it is installed, since it is much faster than html.parser.
+"""
+import hashlib
+import importlib.util
+import threading
+from collections import OrderedDict
+
+from lab_utils.chunking import get_chunk_encoding
+
+PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "template", "svg", "iframe",
+    "nav", "header", "footer", "aside", "form",
+]
+MAIN_CONTENT_SELECTORS = ["main", "article", "[role=main]", "#content", "#main"]
+CACHE_ITEMS = 128
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def extract_main_text(html):
+    """Return the readable text of the page's main content, one block per line."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, PARSER)
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    root = None
+    for selector in MAIN_CONTENT_SELECTORS:
+        root = soup.select_one(selector)
+        if root is not None and root.get_text(strip=True):
+            break
+        root = None
+    root = root or soup.body or soup
+    lines = (line.strip() for line in root.get_text("\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def trim_to_tokens(text, token_budget):
+    encoding = get_chunk_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= token_budget:
+        return text
+    return encoding.decode(tokens[:token_budget])
+
+
+def page_text(url, html, token_budget):
+    """Main text of a fetched page, trimmed to token_budget.
+
+    Extraction results are cached by URL and content hash, so an unchanged
+    page is only parsed once per process.
+    """
+    key = (url, hashlib.sha256(html).hexdigest())
+    with _cache_lock:
+        text = _cache.get(key)
+        if text is not None:
+            _cache.move_to_end(key)
+    if text is None:
+        text = extract_main_text(html)
+        with _cache_lock:
+            _cache[key] = text
+            while len(_cache) > CACHE_ITEMS:
+                _cache.popitem(last=False)
+    return trim_to_tokens(text, token_budget)
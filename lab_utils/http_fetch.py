@@ -0,0 +1,140 @@
+"""Pooled, concurrent URL fetching with an on-disk HTTP cache.
+
+All requests go through one shared requests.Session, so connections are
+reused across reruns and sessions. Responses are stored under .cache/http:
+within the TTL a cached body is returned with no network at all; after
+that the cache revalidates with If-None-Match / If-Modified-Since and a
+304 reuses the stored body. A cache that can't be read or written is
+treated as empty; the fetch still goes through.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CACHE_DIR = Path(".cache/http")
+DEFAULT_TTL_SECONDS = 5 * 60
+DEFAULT_TIMEOUT = (5, 15)   # (connect, read) seconds
+MAX_WORKERS = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """One process-wide Session with a connection pool big enough for concurrent fetches."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+class FetchResult(NamedTuple):
+    url: str
+    content: Optional[bytes]
+    source: str                      # "cache", "revalidated", "network" or "error"
+    error: Optional[Exception] = None
+
+
+class HttpCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{name}.json", self.directory / f"{name}.body"
+
+    def load(self, url):
+        """Return (metadata, body), or (None, None) if the URL was never cached."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, json.JSONDecodeError):
+            return None, None
+
+    def _write(self, path, data):
+        # a temp file of our own, so concurrent fetches of one URL never write to the same file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def store(self, url, meta, body=None):
+        """Write metadata, and the body too when one is given. Raises OSError if the cache isn't writable."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        if body is not None:
+            self._write(body_path, body)
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def _store_quietly(cache, url, meta, body=None):
+    try:
+        cache.store(url, meta, body)
+    except OSError:
+        pass    # serve the response uncached
+
+
+http_cache = HttpCache()
+
+
+def fetch_url(url, cache=http_cache, timeout=DEFAULT_TIMEOUT):
+    """Fetch one URL through the cache. Errors are returned, not raised."""
+    meta, body = cache.load(url)
+    if meta and time.time() - meta["fetched_at"] < cache.ttl_seconds:
+        return FetchResult(url, body, "cache")
+
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and meta:
+            meta["fetched_at"] = time.time()
+            _store_quietly(cache, url, meta)
+            return FetchResult(url, body, "revalidated")
+        response.raise_for_status()
+    except requests.RequestException as e:
+        return FetchResult(url, None, "error", e)
+
+    _store_quietly(cache, url, {
+        "fetched_at": time.time(),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_type": response.headers.get("Content-Type"),
+    }, response.content)
+    return FetchResult(url, response.content, "network")
+
+
+def fetch_urls(urls, cache=http_cache, timeout=DEFAULT_TIMEOUT):
+    """Fetch several URLs at once. Returns FetchResults in the same order as urls."""
+    urls = list(urls)
+    if len(urls) <= 1:
+        return [fetch_url(url, cache, timeout) for url in urls]
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(urls))) as pool:
+        return list(pool.map(lambda url: fetch_url(url, cache, timeout), urls))
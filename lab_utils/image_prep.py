@@ -0,0 +1,68 @@
+"""Shrink images before they are sent to a vision model.
+
+The API downsamples images to a size that depends on the `detail` level, so
+anything larger is wasted upload. Images are decoded, fitted to that size,
+and re-encoded as JPEG (or WebP when they have transparency).
+"""
+import base64
+import io
+from typing import NamedTuple
+
+# longest side the API works with for each detail level
+DETAIL_MAX_SIDE = {"low": 512, "high": 2048, "auto": 2048}
+# for "high", the shortest side is scaled down to this as well
+HIGH_DETAIL_SHORT_SIDE = 768
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+
+class PreparedImage(NamedTuple):
+    data_uri: str
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    original_bytes: int
+
+    @property
+    def saved_bytes(self):
+        return self.original_bytes - len(self.data)
+
+
+def target_size(width, height, detail="low"):
+    scale = min(1.0, DETAIL_MAX_SIDE.get(detail, 2048) / max(width, height))
+    if detail != "low":
+        scale = min(scale, HIGH_DETAIL_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def prepare_image(data, detail="low", original_mime=None):
+    """Resize and recompress image bytes for the given detail level.
+
+    If re-encoding wouldn't make the image smaller (e.g. an already tiny
+    JPEG), the original bytes are kept, and width and height are theirs.
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    original_size = image.size
+    image.seek(0)                               # first frame of animated GIFs
+    image = ImageOps.exif_transpose(image)      # phone photos store rotation in EXIF
+    size = target_size(*image.size, detail)
+    if size != image.size:
+        image = image.resize(size, Image.LANCZOS)
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    output = io.BytesIO()
+    if has_alpha:
+        image.convert("RGBA").save(output, "WEBP", quality=WEBP_QUALITY, method=4)
+        mime = "image/webp"
+    else:
+        image.convert("RGB").save(output, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        mime = "image/jpeg"
+    encoded = output.getvalue()
+
+    if len(encoded) >= len(data) and original_mime:
+        encoded, mime, size = data, original_mime, original_size
+    b64 = base64.b64encode(encoded).decode("utf-8")
+    return PreparedImage(f"data:{mime};base64,{b64}", encoded, mime, size[0], size[1], len(data))
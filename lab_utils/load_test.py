@@ -0,0 +1,292 @@
+"""Load test the labs against the local mock OpenAI server.
+
+    python -m lab_utils.load_test --sessions 8 --turns 5
+    python -m lab_utils.load_test Lab3 Lab9 --sessions 20 --latency 0.8 --tokens-per-second 40
+    python -m lab_utils.load_test --base-url http://127.0.0.1:8700/v1   # an already running mock
+
+Every page listed in streamlit_app.py (or just the ones named) is driven
+by N simulated sessions at once, each with streamlit's AppTest: one load
+of the page, then a number of turns (a chat message, or the page's main
+button). The report gives turn latency percentiles, time to first token
+(measured at the mock server, per model request) and throughput.
+
+AppTest swaps process-wide streamlit state on every run, so sessions
+can't share a process. Each session runs in its own process and scratch
+directory; st.cache_resource is therefore per session, as if every user
+landed on a freshly started replica. Nothing leaves the machine: the
+mock also stands in for OpenWeatherMap (Lab5) and serves the image Lab8
+captions, and where tiktoken can't download its encodings, the
+benchmarks' stand-in tokenizer is used. Turns skip the labs' result
+caches (Lab2's summary cache, Lab8's caption cache) so every one reaches
+the model.
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from lab_utils import mock_openai
+from lab_utils.benchmarks import use_offline_tokenizer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP_FILE = REPO_ROOT / "streamlit_app.py"
+DATA_DIRS = ["Lab-04-Data"]
+SECRETS = {"OPENAI_API_KEY": "sk-load-test", "OPEN_WEATHER_API_KEY": "load-test"}
+PROMPTS = [
+    "What is this course about?",
+    "How are assignments graded?",
+    "Can you give me a short summary?",
+    "What should I do first?",
+    "Tell me more about that.",
+]
+RUN_TIMEOUT = 120
+# how long Lab4 may spend indexing its documents before turns start
+INDEXING_TIMEOUT = 300
+
+
+def app_pages(app_file=APP_FILE):
+    """Page script paths passed to st.Page() in streamlit_app.py, in order."""
+    tree = ast.parse(Path(app_file).read_text())
+    pages = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "Page"
+                and node.args and isinstance(node.args[0], ast.Constant)):
+            pages.append(REPO_ROOT / node.args[0].value)
+    return pages
+
+
+# ── per-page scenarios ──────────────────────────────────────────────
+# setup(at, context) runs once after the first load, and raises if the page isn't usable (the
+# session then records the error and runs no turns); turn(at, i, context) is one timed interaction.
+
+def _chat_turn(at, i, context):
+    at.chat_input[0].set_value(PROMPTS[i % len(PROMPTS)]).run()
+
+
+def _lab1_setup(at, context):
+    at.text_input[0].input(SECRETS["OPENAI_API_KEY"]).run()
+    at.file_uploader[0].upload("notes.txt", context["document"].encode("utf-8"), "text/plain")
+    at.run()
+
+
+def _lab1_turn(at, i, context):
+    at.text_area[0].input(f"{PROMPTS[i % len(PROMPTS)]} ({i})").run()
+
+
+def _lab2_setup(at, context):
+    # every turn should reach the model, not the summary cache
+    next(box for box in at.sidebar.checkbox if box.label == "Bypass summary cache").check()
+    pdf = context.get("pdf")
+    if pdf:
+        at.file_uploader[0].upload(pdf.name, pdf.read_bytes(), "application/pdf")
+    else:
+        at.file_uploader[0].upload("notes.txt", context["document"].encode("utf-8"), "text/plain")
+    at.run()
+
+
+def _lab2_turn(at, i, context):
+    at.button[0].click().run()
+
+
+def _lab4_setup(at, context):
+    # documents are indexed in the background; wait for that so turns use retrieval
+    deadline = time.time() + INDEXING_TIMEOUT
+    while time.time() < deadline:
+        at.run()
+        if any("Chunks in ChromaDB" in element.value for element in at.sidebar.markdown):
+            return
+        failed = [element.value for element in at.sidebar.error if "Indexing failed" in element.value]
+        if failed:
+            raise RuntimeError(failed[0])
+        time.sleep(0.5)
+    raise RuntimeError(f"Lab4 indexing didn't finish within {INDEXING_TIMEOUT}s")
+
+
+def _lab5_setup(at, context):
+    at.text_input[0].input("Syracuse, NY, US")
+
+
+def _button_turn(at, i, context):
+    at.button[0].click().run()
+
+
+def _lab8_turn(at, i, context):
+    # a new URL every turn, so the caption cache (keyed on URL and bytes) misses
+    at.text_input[0].input(f"{context['image_url']}?turn={i}")
+    at.button[0].click().run()
+
+
+SCENARIOS = {
+    "Lab1": (_lab1_setup, _lab1_turn),
+    "Lab2": (_lab2_setup, _lab2_turn),
+    "Lab4": (_lab4_setup, _chat_turn),
+    "Lab5": (_lab5_setup, _button_turn),
+    "Lab8": (None, _lab8_turn),
+}
+DEFAULT_SCENARIO = (None, _chat_turn)
+
+
+def run_session(page, turns, base_url, workdir, timeout=RUN_TIMEOUT):
+    """One simulated user in its own process. Returns a dict of timings and errors."""
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(workdir)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENWEATHER_URL"] = base_url.rsplit("/v1", 1)[0] + "/data/2.5/weather"
+    # without network access tiktoken can't fetch its encodings; fall back to a stand-in
+    use_offline_tokenizer()
+    page = Path(page)
+    setup, turn = SCENARIOS.get(page.stem, DEFAULT_SCENARIO)
+    context = {
+        "document": " ".join(PROMPTS * 40),
+        "image_url": base_url.rsplit("/v1", 1)[0] + "/mock/image.png",
+        "pdf": next(iter(sorted((REPO_ROOT / "Lab-04-Data").glob("*.pdf"))), None),
+    }
+    result = {"load": None, "turns": [], "errors": []}
+
+    def errors(at):
+        # uncaught exceptions, and the ones pages catch and show with st.error
+        return [e.message for e in at.exception] + [e.value for e in at.error]
+
+    at = AppTest.from_file(str(page), default_timeout=timeout)
+    at.secrets.update(SECRETS)
+    try:
+        start = time.time()
+        at.run()
+        result["load"] = time.time() - start
+        result["errors"] += errors(at)
+        if setup:
+            setup(at, context)
+            result["errors"] += errors(at)
+        for i in range(turns):
+            start = time.time()
+            turn(at, i, context)
+            result["turns"].append({"start": start, "end": time.time()})
+            result["errors"] += errors(at)
+    except Exception as e:
+        result["errors"].append(f"{type(e).__name__}: {e}")
+    return result
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = (len(values) - 1) * q / 100
+    low = int(index)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (index - low)
+
+
+def summarize(page, sessions, requests):
+    """Percentiles and throughput over the timed turns (page loads and setup are left out)."""
+    turns = [t for s in sessions for t in s["turns"]]
+    turn_latencies = [t["end"] - t["start"] for t in turns]
+    window = (min(t["start"] for t in turns), max(t["end"] for t in turns)) if turns else (0.0, 0.0)
+    seconds = window[1] - window[0]
+    in_window = [r for r in requests if window[0] <= r["start"] <= window[1]]
+    model_requests = [r for r in in_window if r["endpoint"] != "embeddings" and r["status"] == 200]
+    ttft = [r["first_token"] - r["start"] for r in model_requests if r["first_token"]]
+    errors = [error for s in sessions for error in s["errors"]]
+    return {
+        "page": page,
+        "sessions": len(sessions),
+        "turns": len(turns),
+        "turn_window_seconds": seconds,
+        "load_p50": percentile([s["load"] for s in sessions if s["load"] is not None], 50),
+        **{f"turn_p{q}": percentile(turn_latencies, q) for q in (50, 95, 99)},
+        **{f"ttft_p{q}": percentile(ttft, q) for q in (50, 95, 99)},
+        "turns_per_second": len(turns) / seconds if seconds else 0.0,
+        "output_tokens_per_second": sum(r["output_tokens"] for r in model_requests) / seconds if seconds else 0.0,
+        "api_requests": len(in_window),
+        "api_errors": sum(r["status"] != 200 for r in in_window),
+        "errors": len(errors),
+        "first_error": errors[0][:200] if errors else None,
+    }
+
+
+def _stats(base_url):
+    root = base_url.rsplit("/v1", 1)[0]
+    with urllib.request.urlopen(root + "/mock/stats") as response:
+        return json.load(response)["requests"]
+
+
+def run_page(page, sessions, turns, base_url, timeout=RUN_TIMEOUT):
+    """Drive one page with `sessions` concurrent sessions. Returns its summary dict."""
+    before = len(_stats(base_url))
+    with tempfile.TemporaryDirectory(prefix="load-test-") as scratch:
+        workdirs = []
+        for i in range(sessions):
+            workdir = Path(scratch) / f"session-{i}"
+            workdir.mkdir()
+            for name in DATA_DIRS:
+                if (REPO_ROOT / name).exists():
+                    os.symlink(REPO_ROOT / name, workdir / name)
+            workdirs.append(str(workdir))
+        with ProcessPoolExecutor(max_workers=sessions, mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(run_session, str(page), turns, base_url, workdir, timeout) for workdir in workdirs]
+            results = [future.result() for future in futures]
+    requests = _stats(base_url)[before:]
+    return summarize(Path(page).stem, results, requests)
+
+
+def _ms(value):
+    return f"{value * 1000:.0f}" if value is not None else "-"
+
+
+def format_table(summaries):
+    header = (f"{'page':<6} {'sess':>4} {'turns':>5} {'load p50':>9} {'turn p50':>9} {'p95':>7} {'p99':>7} "
+              f"{'ttft p50':>9} {'p95':>7} {'p99':>7} {'turns/s':>8} {'tok/s':>7} {'api err':>7} {'errors':>6}")
+    lines = [header, "(times in ms; 'api err' counts injected errors, which the SDK retries, 'errors' the ones pages showed)"]
+    for s in summaries:
+        lines.append(
+            f"{s['page']:<6} {s['sessions']:>4} {s['turns']:>5} {_ms(s['load_p50']):>9} "
+            f"{_ms(s['turn_p50']):>9} {_ms(s['turn_p95']):>7} {_ms(s['turn_p99']):>7} "
+            f"{_ms(s['ttft_p50']):>9} {_ms(s['ttft_p95']):>7} {_ms(s['ttft_p99']):>7} "
+            f"{s['turns_per_second']:>8.2f} {s['output_tokens_per_second']:>7.0f} {s['api_errors']:>7} {s['errors']:>6}"
+        )
+        if s["first_error"]:
+            lines.append(f"{'':<6} first error: {s['first_error']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the labs against a mock OpenAI API.")
+    parser.add_argument("pages", nargs="*", help="page names, e.g. Lab3 (default: every page in streamlit_app.py)")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions per page")
+    parser.add_argument("--turns", type=int, default=3, help="interactions per session")
+    parser.add_argument("--timeout", type=float, default=RUN_TIMEOUT, help="seconds allowed per script run")
+    parser.add_argument("--base-url", help="use a mock server that is already running instead of starting one")
+    parser.add_argument("--json", action="store_true", help="print the summaries as JSON")
+    mock_openai.add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = mock_openai.start_in_background(mock_openai.config_from_args(args))
+    pages = app_pages()
+    if args.pages:
+        pages = [page for page in pages if page.stem in args.pages]
+
+    summaries = []
+    try:
+        for page in pages:
+            print(f"{page.stem}: {args.sessions} sessions x {args.turns} turns...", file=sys.stderr)
+            summaries.append(run_page(page, args.sessions, args.turns, base_url, args.timeout))
+    finally:
+        if server:
+            server.shutdown()
+    print(json.dumps(summaries, indent=2) if args.json else format_table(summaries))
+    return 1 if any(s["errors"] for s in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
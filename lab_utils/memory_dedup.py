@@ -0,0 +1,220 @@
+"""Near-duplicate detection for Lab9 memories.
+
+Two memories are only duplicates when they name the same things: every
+number and capitalized word ("IST 418", "Anna", "March 3") has to match,
+so facts that differ in one short token are never merged. Past that,
+- embedding cosine similarity catches paraphrases
+  ("User's name is Alice" / "The user is called Alice"), and
+- MinHash over the memory's words with LSH banding catches near-identical
+  wording, for memories stored without an embedding.
+"""
+import hashlib
+import random
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+
+from lab_utils.bm25 import STOPWORDS
+
+EMBEDDING_THRESHOLD = 0.9
+MINHASH_THRESHOLD = 0.8
+
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(488)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)
+_B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)
+# within one LSH bucket, each memory is compared with at most this many later ones;
+# templated facts ("User is taking IST ...") can put thousands in the same bucket
+MAX_NEIGHBORS = 64
+
+# capitalized words that start a fact rather than name something
+_NOT_NAMES = STOPWORDS | {"user", "users", "he", "she", "they", "his", "her", "their", "them"}
+
+
+def shingles(text):
+    """The words of text, lowercased. Memories are short, so single words are the shingles."""
+    return set(re.findall(r"[a-z0-9]+", text.lower())) or {""}
+
+
+@lru_cache(maxsize=1 << 16)
+def key_tokens(text):
+    """Numbers and capitalized words (names, course codes, months) in text, normalized."""
+    keys = set()
+    for token in re.findall(r"[A-Za-z]+|[0-9]+", text):
+        if token.isdigit():
+            keys.add(str(int(token)))
+        elif any(char.isupper() for char in token) and token.lower() not in _NOT_NAMES:
+            keys.add(token.lower())
+    return frozenset(keys)
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+@lru_cache(maxsize=1 << 16)
+def minhash(text):
+    # signatures are memoized: the duplicate index is rebuilt from the same facts after every write
+    hashes = np.array([_hash(shingle) for shingle in shingles(text)], dtype=np.uint64)
+    # all permutations at once; uint64 arithmetic wraps around, which is fine for a hash family
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(hashes, _A) + _B) % np.uint64(_PRIME)
+    signature = permuted.min(axis=0)
+    signature.flags.writeable = False   # shared by every caller through the cache
+    return signature
+
+
+def estimated_jaccard(signature_a, signature_b):
+    return np.count_nonzero(np.asarray(signature_a) == np.asarray(signature_b)) / NUM_PERM
+
+
+def unit_vector(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+
+def same_fact(text_a, text_b, vector_a=None, vector_b=None):
+    """True when two memories say the same thing.
+
+    Their numbers and names must match. Then, if both have unit vectors,
+    the embeddings decide; otherwise their words must be near-identical.
+    """
+    if key_tokens(text_a) != key_tokens(text_b):
+        return False
+    if vector_a is not None and vector_b is not None:
+        return float(vector_a @ vector_b) >= EMBEDDING_THRESHOLD
+    return estimated_jaccard(minhash(text_a), minhash(text_b)) >= MINHASH_THRESHOLD
+
+
+class LexicalDuplicateIndex:
+    """MinHash signatures bucketed by LSH band, so lookups only compare likely matches."""
+
+    def __init__(self):
+        self.signatures = {}
+        self._buckets = defaultdict(set)
+
+    def _bands(self, signature):
+        return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()) for band in range(BANDS)]
+
+    def add(self, key, text):
+        """Index text under key, replacing whatever key held before."""
+        self.remove(key)
+        signature = minhash(text)
+        self.signatures[key] = signature
+        for band in self._bands(signature):
+            self._buckets[band].add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band in self._bands(signature):
+            bucket = self._buckets[band]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band]
+
+    def candidates(self, signature):
+        found = set()
+        for band in self._bands(signature):
+            found |= self._buckets.get(band, set())
+        return found
+
+    def find(self, text, threshold=MINHASH_THRESHOLD, accept=None):
+        """Key of the most similar indexed text at or above threshold, or None.
+
+        accept(key), when given, rules candidates in or out before they are scored.
+        """
+        signature = minhash(text)
+        keys = [key for key in self.candidates(signature) if accept is None or accept(key)]
+        if not keys:
+            return None
+        matches = np.count_nonzero(np.stack([self.signatures[key] for key in keys]) == signature, axis=1)
+        best = int(np.argmax(matches))
+        return keys[best] if matches[best] >= threshold * NUM_PERM else None
+
+    def pairs(self, threshold=MINHASH_THRESHOLD, labels=None, skip=None):
+        """(key_a, key_b) pairs at or above threshold, key_a < key_b.
+
+        Each key is only compared with the next MAX_NEIGHBORS keys of a
+        bucket, so the work grows linearly with crowded buckets. With labels
+        (an integer array indexed by key) only keys with equal labels pair up.
+        A pair that shares several buckets can come up more than once;
+        skip(key_a, key_b) lets a caller merging pairs with union-find pass
+        over the ones it has already connected.
+        """
+        for bucket in self._buckets.values():
+            if len(bucket) < 2:
+                continue
+            keys = sorted(bucket)
+            signatures = np.stack([self.signatures[key] for key in keys])
+            bucket_labels = labels[keys] if labels is not None else None
+            for i, key_a in enumerate(keys[:-1]):
+                window = signatures[i + 1:i + 1 + MAX_NEIGHBORS]
+                close = np.count_nonzero(window == signatures[i], axis=1) >= threshold * NUM_PERM
+                if bucket_labels is not None:
+                    close &= bucket_labels[i + 1:i + 1 + MAX_NEIGHBORS] == bucket_labels[i]
+                for offset in np.flatnonzero(close):
+                    key_b = keys[i + 1 + int(offset)]
+                    if skip is None or not skip(key_a, key_b):
+                        yield key_a, key_b
+
+
+def embedding_pairs(matrix, threshold=EMBEDDING_THRESHOLD, block=1024, labels=None, skip=None):
+    """(i, j) row pairs, i < j, whose unit vectors have cosine >= threshold.
+
+    Computed block by block so tens of thousands of rows never need the
+    full n x n similarity matrix in memory. Each row is paired with at most
+    MAX_NEIGHBORS later rows, its most similar ones. labels (one per row)
+    and skip(i, j) work as in LexicalDuplicateIndex.pairs().
+    """
+    columns = np.arange(len(matrix))
+    for start in range(0, len(matrix), block):
+        similarities = matrix[start:start + block] @ matrix.T
+        close = (similarities >= threshold) & (columns > columns[start:start + block, None])
+        if labels is not None:
+            close &= labels[start:start + block, None] == labels
+        for row in np.flatnonzero(np.count_nonzero(close, axis=1) > MAX_NEIGHBORS):
+            cols = np.flatnonzero(close[row])
+            close[row] = False
+            close[row, cols[np.argpartition(-similarities[row, cols], MAX_NEIGHBORS)[:MAX_NEIGHBORS]]] = True
+        for row, col in zip(*np.nonzero(close)):
+            i, j = start + int(row), int(col)
+            if skip is None or not skip(i, j):
+                yield i, j
+
+
+class DisjointSets:
+    """Union-find over 0..count-1."""
+
+    def __init__(self, count):
+        self._parent = list(range(count))
+
+    def find(self, i):
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def connected(self, a, b):
+        return self.find(a) == self.find(b)
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self._parent[root_b] = root_a
+
+    def groups(self):
+        """The sets with 2+ members."""
+        groups = defaultdict(list)
+        for i in range(len(self._parent)):
+            groups[self.find(i)].append(i)
+        return [group for group in groups.values() if len(group) > 1]
+
@@ -0,0 +1,363 @@
+"""SQLite-backed long-term memory store for Lab9.
+
+Memories are namespaced per user and only ever appended (or cleared per
+user), so saving a new fact is one INSERT instead of rewriting a JSON file.
+The database runs in WAL mode so concurrent sessions can read while one
+writes. Reads are served from an in-process cache. This process's own
+adds and pin changes update it in place (vectors, BM25 and MinHash
+indexes included); it is reloaded after compact() or clear(), or when
+SQLite reports that another connection has written (PRAGMA data_version).
+
+Each memory can carry an embedding and a pinned flag. relevant() returns
+the pinned memories plus the ones closest to the current message, within
+a token budget, so the prompt stays the same size however many memories
+a user has.
+
+Near-duplicates (see memory_dedup) are merged when they are added, and
+compact() folds any clusters that slipped through into one memory each.
+"""
+import json
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from lab_utils.bm25 import BM25Index, reciprocal_rank_fusion
+from lab_utils.chunking import count_text_tokens
+from lab_utils.memory_dedup import (
+    EMBEDDING_THRESHOLD, DisjointSets, LexicalDuplicateIndex, embedding_pairs, key_tokens, same_fact, unit_vector,
+)
+
+DEFAULT_DB_PATH = Path("memories.sqlite3")
+
+
+class MemoryStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memories ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id TEXT NOT NULL, "
+                "fact TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "pinned INTEGER NOT NULL DEFAULT 0, "
+                "embedding BLOB)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(memories)")}
+            # databases created before memories had embeddings
+            if "pinned" not in columns:
+                self._db.execute("ALTER TABLE memories ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0")
+            if "embedding" not in columns:
+                self._db.execute("ALTER TABLE memories ADD COLUMN embedding BLOB")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS memories_by_user ON memories (user_id, id)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+        self._cache = {}              # user_id -> loaded memories (see _load)
+        self._data_version = None
+
+    def _check_external_writes(self):
+        # data_version only changes when *another* connection commits
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._cache.clear()
+            self._data_version = version
+
+    def _load(self, user_id):
+        """Read a user's memories into the cache. Caller holds the lock."""
+        self._check_external_writes()
+        if user_id not in self._cache:
+            rows = self._db.execute(
+                "SELECT id, fact, pinned, embedding FROM memories WHERE user_id = ? ORDER BY id",
+                (user_id,),
+            ).fetchall()
+            vectors = [np.frombuffer(row[3], dtype=np.float32) if row[3] else None for row in rows]
+            embedded = [i for i, vector in enumerate(vectors) if vector is not None]
+            buffer = matrix = None
+            if embedded:
+                buffer = np.stack([vectors[i] for i in embedded])
+                buffer /= np.linalg.norm(buffer, axis=1, keepdims=True) + 1e-12
+                matrix = buffer
+            self._cache[user_id] = {
+                "ids": [row[0] for row in rows],
+                "facts": [row[1] for row in rows],
+                "pinned": [bool(row[2]) for row in rows],
+                "embedded": embedded,        # positions of memories that have a vector
+                "rows": {position: row for row, position in enumerate(embedded)},
+                "matrix": matrix,            # their unit vectors, one per row (a view of buffer)
+                "buffer": buffer,            # room for more rows, so adding one doesn't copy them all
+                "lexical": None,             # BM25 index, built on first use
+                "duplicates": None,          # MinHash index, built on first use
+            }
+        return self._cache[user_id]
+
+    def _set_vector(self, entry, position, vector):
+        """Store a memory's unit vector in the cached matrix. Caller holds the lock."""
+        row = entry["rows"].get(position)
+        if row is None:
+            row = len(entry["embedded"])
+            buffer = entry["buffer"]
+            if buffer is None or row == len(buffer):
+                grown = np.empty((max(16, 2 * row), len(vector)), dtype=np.float32)
+                if row:
+                    grown[:row] = buffer[:row]
+                entry["buffer"] = buffer = grown
+            entry["embedded"].append(position)
+            entry["rows"][position] = row
+            entry["matrix"] = buffer[:row + 1]
+        entry["buffer"][row] = vector
+
+    def _cache_fact(self, entry, position, fact, vector):
+        """Put a new or updated memory into the cached entry and its indexes. Caller holds the lock."""
+        entry["facts"][position] = fact
+        if vector is not None:
+            self._set_vector(entry, position, vector)
+        if entry["lexical"] is not None:
+            entry["lexical"].add(position, fact)
+        if entry["duplicates"] is not None:
+            entry["duplicates"].add(position, fact)
+
+    def _duplicate_index(self, entry):
+        if entry["duplicates"] is None:
+            entry["duplicates"] = LexicalDuplicateIndex()
+            for position, fact in enumerate(entry["facts"]):
+                entry["duplicates"].add(position, fact)
+        return entry["duplicates"]
+
+    def _find_duplicate(self, entry, fact, vector):
+        """Position of an existing memory that fact restates, or None.
+
+        When fact has an embedding, memories that have one too are judged by
+        cosine similarity alone; MinHash only checks the ones without.
+        """
+        keys = key_tokens(fact)
+        judged = ()
+        if vector is not None and entry["matrix"] is not None:
+            scores = entry["matrix"] @ vector
+            close = np.flatnonzero(scores >= EMBEDDING_THRESHOLD)
+            for row in close[np.argsort(-scores[close])]:
+                position = entry["embedded"][row]
+                if key_tokens(entry["facts"][position]) == keys:
+                    return position
+            judged = set(entry["embedded"])
+        return self._duplicate_index(entry).find(
+            fact, accept=lambda position: position not in judged and key_tokens(entry["facts"][position]) == keys,
+        )
+
+    def list(self, user_id):
+        """All of a user's memories, oldest first."""
+        with self._lock:
+            return list(self._load(user_id)["facts"])
+
+    def records(self, user_id):
+        """(id, fact, pinned) for all of a user's memories, oldest first."""
+        with self._lock:
+            entry = self._load(user_id)
+            return list(zip(entry["ids"], entry["facts"], entry["pinned"]))
+
+    def count(self, user_id):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM memories WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+    def add(self, user_id, facts, embeddings=None):
+        """Append facts, optionally with one embedding per fact, merging near-duplicates.
+
+        A duplicate must name the same things (see memory_dedup.same_fact),
+        so a changed number or name is stored as a new memory. A fact that
+        restates an existing memory replaces it unless it is shorter (less
+        specific); on equal length the newer wording wins.
+        Returns counts of added, merged and skipped facts.
+        """
+        if embeddings is None:
+            embeddings = [None] * len(facts)
+        counts = {"added": 0, "merged": 0, "skipped": 0}
+        now = time.time()
+        with self._lock, self._db, self._dropping_cache_on_error(user_id):
+            entry = self._load(user_id)
+            accepted = []      # (fact, embedding, unit vector) of new facts kept so far
+            for fact, embedding in zip(facts, embeddings):
+                if not isinstance(fact, str) or not fact.strip():
+                    continue
+                fact = fact.strip()
+                vector = unit_vector(embedding) if embedding is not None else None
+
+                # duplicates within this batch: keep the longer one, or the later one on ties
+                twin = next(
+                    (i for i, (other, _, other_vector) in enumerate(accepted)
+                     if same_fact(fact, other, vector, other_vector)),
+                    None,
+                )
+                if twin is not None:
+                    if len(fact) >= len(accepted[twin][0]):
+                        if embedding is None:
+                            _, embedding, vector = accepted[twin]
+                        accepted[twin] = (fact, embedding, vector)
+                    counts["skipped"] += 1
+                    continue
+
+                position = self._find_duplicate(entry, fact, vector)
+                if position is None:
+                    accepted.append((fact, embedding, vector))
+                elif fact != entry["facts"][position] and len(fact) >= len(entry["facts"][position]):
+                    self._db.execute(
+                        "UPDATE memories SET fact = ?, embedding = COALESCE(?, embedding) WHERE id = ?",
+                        (fact, _to_blob(embedding), entry["ids"][position]),
+                    )
+                    self._cache_fact(entry, position, fact, vector)
+                    counts["merged"] += 1
+                else:
+                    counts["skipped"] += 1
+
+            for fact, embedding, vector in accepted:
+                cursor = self._db.execute(
+                    "INSERT INTO memories (user_id, fact, created_at, embedding) VALUES (?, ?, ?, ?)",
+                    (user_id, fact, now, _to_blob(embedding)),
+                )
+                entry["ids"].append(cursor.lastrowid)
+                entry["facts"].append(fact)
+                entry["pinned"].append(False)
+                self._cache_fact(entry, len(entry["facts"]) - 1, fact, vector)
+            counts["added"] = len(accepted)
+        return counts
+
+    @contextmanager
+    def _dropping_cache_on_error(self, user_id):
+        # the transaction rolls back on error, so the cache may no longer match the database
+        try:
+            yield
+        except BaseException:
+            self._cache.pop(user_id, None)
+            raise
+
+    def compact(self, user_id):
+        """Fold clusters of near-duplicate memories into one memory each.
+
+        Pairs are linked under the same rules as add(): matching numbers and
+        names, then embeddings where both memories have one, MinHash where
+        they don't. The longest fact in a cluster (newest on ties) is kept,
+        and stays pinned if any member was. Returns how many memories were
+        removed.
+        """
+        with self._lock, self._db:
+            entry = self._load(user_id)
+            facts = entry["facts"]
+            embedded = set(entry["embedded"])
+            sets = DisjointSets(len(facts))
+            # memories can only pair up with ones that have the same numbers and names
+            label_of = {}
+            labels = np.array([label_of.setdefault(key_tokens(fact), len(label_of)) for fact in facts], dtype=np.int64)
+
+            for a, b in self._duplicate_index(entry).pairs(
+                    labels=labels, skip=lambda a, b: (a in embedded and b in embedded) or sets.connected(a, b)):
+                sets.union(a, b)
+            if entry["matrix"] is not None:
+                rows = entry["embedded"]
+                for i, j in embedding_pairs(entry["matrix"], labels=labels[rows],
+                                            skip=lambda i, j: sets.connected(rows[i], rows[j])):
+                    sets.union(rows[i], rows[j])
+            removed = []
+            for group in sets.groups():
+                keep = max(group, key=lambda position: (len(entry["facts"][position]), entry["ids"][position]))
+                if any(entry["pinned"][position] for position in group):
+                    self._db.execute("UPDATE memories SET pinned = 1 WHERE id = ?", (entry["ids"][keep],))
+                removed += [entry["ids"][position] for position in group if position != keep]
+            if removed:
+                self._db.executemany("DELETE FROM memories WHERE id = ?", [(memory_id,) for memory_id in removed])
+                self._cache.pop(user_id, None)
+        return len(removed)
+
+    def set_pinned(self, user_id, memory_id, pinned):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE memories SET pinned = ? WHERE user_id = ? AND id = ?",
+                (int(pinned), user_id, memory_id),
+            )
+            entry = self._cache.get(user_id)
+            if entry is not None:
+                position = bisect_left(entry["ids"], memory_id)
+                if position < len(entry["ids"]) and entry["ids"][position] == memory_id:
+                    entry["pinned"][position] = bool(pinned)
+
+    def clear(self, user_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM memories WHERE user_id = ?", (user_id,))
+            self._cache.pop(user_id, None)
+
+    def relevant(self, user_id, query_text, query_vector=None, k=8, token_budget=300):
+        """Pinned memories plus the top-k most relevant others, within token_budget.
+
+        Ranked by cosine similarity when query_vector is given and memories
+        have embeddings, otherwise by BM25 over the memory text. Memories
+        without an embedding (imported from memories.json, or stored while
+        the embedding call failed) are ranked by BM25 and fused with the
+        vector ranking, so they can still be picked. Pinned memories are
+        always included and count against the budget first.
+        """
+        with self._lock:
+            entry = self._load(user_id)
+            # copies: the cached lists grow in place when memories are added
+            facts, pinned = list(entry["facts"]), list(entry["pinned"])
+            if entry["lexical"] is None:
+                entry["lexical"] = BM25Index()
+                for position, fact in enumerate(facts):
+                    entry["lexical"].add(position, fact)
+            lexical = [position for position, _ in entry["lexical"].search(query_text, k=len(facts))]
+            if query_vector is not None and entry["matrix"] is not None:
+                query = np.asarray(query_vector, dtype=np.float32)
+                query = query / (np.linalg.norm(query) + 1e-12)
+                scores = entry["matrix"] @ query
+                ranked = [entry["embedded"][i] for i in np.argsort(-scores)]
+                if len(entry["embedded"]) < len(facts):
+                    embedded = set(entry["embedded"])
+                    unembedded = [position for position in lexical if position not in embedded]
+                    ranked = reciprocal_rank_fusion([ranked, unembedded])
+            else:
+                ranked = lexical
+
+        selected = [fact for fact, is_pinned in zip(facts, pinned) if is_pinned]
+        used = sum(count_text_tokens(fact) for fact in selected)
+        added = 0
+        for position in ranked:
+            if added >= k:
+                break
+            if pinned[position]:
+                continue
+            tokens = count_text_tokens(facts[position])
+            if used + tokens > token_budget:
+                continue
+            selected.append(facts[position])
+            used += tokens
+            added += 1
+        return selected
+
+    def import_json_once(self, json_path, user_id):
+        """Copy memories from the old memories.json into user_id's namespace, only the first time."""
+        json_path = Path(json_path)
+        with self._lock:
+            done = self._db.execute(
+                "SELECT 1 FROM store_meta WHERE key = 'imported_json'"
+            ).fetchone()
+        if done or not json_path.exists():
+            return
+        with open(json_path, "r") as f:
+            facts = json.load(f)
+        self.add(user_id, facts)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO store_meta VALUES ('imported_json', ?)", (str(json_path),))
+
+
+def _to_blob(embedding):
+    return np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
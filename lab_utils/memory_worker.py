@@ -0,0 +1,128 @@
+"""Background memory extraction for Lab9.
+
+Finished exchanges are queued instead of being processed inline. A worker
+thread waits briefly for more exchanges to arrive, then sends everything
+it has for a user to the model in one extraction request and stores the
+facts it finds. The chat only waits for its own answer. Every so often
+it also compacts the user's memories to fold near-duplicates together.
+"""
+import json
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+
+EXTRACTION_MODEL = "gpt-4o-mini"
+# run store.compact() for a user after this many new memories
+COMPACT_EVERY = 25
+
+EXTRACTION_PROMPT = """Analyze the following conversation exchanges and extract any new facts about the user worth remembering (e.g., name, preferences, interests, location, major, hobbies, etc.).
+
+{exchanges}
+
+Here are the memories already saved (do NOT duplicate these):
+{known}
+
+Return ONLY a JSON list of new facts as strings. If there are no new facts, return an empty list [].
+Example: ["User's name is Alice", "User likes hiking"]
+Do not include any other text, just the JSON list."""
+
+
+def parse_facts(text):
+    """Turn the model's reply into a list of fact strings ([] if it isn't a JSON list)."""
+    # Clean potential markdown code fences
+    text = text.replace("```json", "").replace("```", "").strip()
+    try:
+        facts = json.loads(text)
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(facts, list):
+        return []
+    return [fact.strip() for fact in facts if isinstance(fact, str) and fact.strip()]
+
+
+def build_extraction_prompt(jobs):
+    exchanges = "\n\n".join(
+        f'Exchange {i}:\nUser said: "{job["user_input"]}"\nAssistant replied: "{job["response"]}"'
+        for i, job in enumerate(jobs, 1)
+    )
+    known = list(dict.fromkeys(memory for job in jobs for memory in job["known_memories"]))
+    return EXTRACTION_PROMPT.format(exchanges=exchanges, known=json.dumps(known))
+
+
+class MemoryExtractionWorker:
+    """Daemon thread that turns queued exchanges into stored memories.
+
+    store is a MemoryStore; embed(client, texts) returns embeddings or None.
+    Jobs that arrive within batch_window seconds of each other (up to
+    max_batch) are handled with one request per user.
+    """
+
+    def __init__(self, store, embed, batch_window=1.5, max_batch=8):
+        self.store = store
+        self.embed = embed
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._pending = Counter()         # user_id -> exchanges not yet processed
+        self._pending_lock = threading.Lock()
+        self._added_since_compaction = Counter()   # only touched by the worker thread
+        self._thread = threading.Thread(target=self._run, name="memory-extraction", daemon=True)
+        self._thread.start()
+
+    def submit(self, client, user_id, user_input, response, known_memories):
+        with self._pending_lock:
+            self._pending[user_id] += 1
+        self._queue.put({
+            "client": client,
+            "user_id": user_id,
+            "user_input": user_input,
+            "response": response,
+            "known_memories": list(known_memories),
+        })
+
+    def pending(self, user_id):
+        with self._pending_lock:
+            return self._pending[user_id]
+
+    def _next_batch(self):
+        jobs = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(jobs) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                jobs.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return jobs
+
+    def _run(self):
+        while True:
+            by_user = defaultdict(list)
+            for job in self._next_batch():
+                by_user[job["user_id"]].append(job)
+            for user_id, jobs in by_user.items():
+                try:
+                    self._extract(user_id, jobs)
+                except Exception:
+                    # memory extraction is best-effort
+                    pass
+                finally:
+                    with self._pending_lock:
+                        self._pending[user_id] -= len(jobs)
+
+    def _extract(self, user_id, jobs):
+        client = jobs[-1]["client"]
+        response = client.chat.completions.create(
+            model=EXTRACTION_MODEL,
+            messages=[{"role": "user", "content": build_extraction_prompt(jobs)}],
+        )
+        facts = parse_facts(response.choices[0].message.content or "")
+        if facts:
+            counts = self.store.add(user_id, facts, self.embed(client, facts))
+            self._added_since_compaction[user_id] += counts["added"]
+            if self._added_since_compaction[user_id] >= COMPACT_EVERY:
+                self.store.compact(user_id)
+                self._added_since_compaction[user_id] = 0
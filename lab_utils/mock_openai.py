@@ -0,0 +1,456 @@
+"""A local stand-in for the OpenAI API, for load tests that shouldn't cost anything.
+
+    python -m lab_utils.mock_openai --port 8700 --latency 0.4 --tokens-per-second 60
+    OPENAI_BASE_URL=http://127.0.0.1:8700/v1 streamlit run streamlit_app.py
+
+The openai SDK reads OPENAI_BASE_URL, so no lab code changes. Supported:
+chat completions (streaming or not, including json_schema response
+formats and function tools), embeddings (float or base64), the Responses
+API (streaming or not, including structured text formats) and the model
+list. Replies are filler text; embeddings are deterministic per input
+text. When a chat request offers function tools, the first reply calls
+one of them with arguments made up from its parameter schema, and the
+reply after the tool results is text.
+
+Every request waits `latency` (+/- `jitter`) seconds before its first
+token and then produces `tokens_per_second` tokens. A fraction
+`error_rate` of requests fail with `error_status` instead. GET
+/mock/stats returns per-request timings (time to first token included),
+POST /mock/reset clears them, and GET /mock/image.png serves a small
+image for pages that caption a URL. GET /data/2.5/weather stands in for
+OpenWeatherMap's current weather endpoint (Lab5 reads OPENWEATHER_URL).
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import random
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FILLER = (
+    "this is a simulated reply from the local mock server used for load testing the labs "
+    "it has no real content but it streams at a steady rate so latency and throughput can be measured"
+).split()
+EMBEDDING_DIMENSIONS = 1536
+ERROR_TYPES = {429: "rate_limit_exceeded", 500: "server_error", 503: "server_error"}
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.3            # seconds before the first token
+    jitter: float = 0.1             # latency varies uniformly by +/- this much
+    tokens_per_second: float = 50.0
+    reply_tokens: int = 80          # length of every text reply
+    error_rate: float = 0.0         # fraction of requests that fail
+    error_status: int = 429
+    seed: int = 0
+
+
+def estimate_tokens(value):
+    """Rough token count (4 characters per token) of any JSON-able request field."""
+    return max(1, len(json.dumps(value)) // 4) if value else 0
+
+
+def filler_tokens(count, offset=0):
+    return [FILLER[(offset + i) % len(FILLER)] + " " for i in range(count)]
+
+
+def fake_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    """A unit vector seeded by the text, so equal texts get equal embeddings."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(x * x for x in vector) ** 0.5
+    return [x / norm for x in vector]
+
+
+def sample_for_schema(schema, defs=None):
+    """A minimal JSON value that matches a JSON schema (for structured outputs)."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return sample_for_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return sample_for_schema(schema[key][0], defs)
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {name: sample_for_schema(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_for_schema(schema.get("items", {}), defs)]
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    return " ".join(FILLER[:8])
+
+
+def mock_weather(location):
+    """OpenWeatherMap's current weather fields that Lab5 reads, steady per location."""
+    rng = random.Random(hashlib.sha256(location.lower().encode("utf-8")).digest())
+    temp = round(rng.uniform(20, 90), 2)
+    return {
+        "name": location.split(",")[0].strip(),
+        "weather": [{"main": "Clouds", "description": "scattered clouds"}],
+        "main": {"temp": temp, "feels_like": round(temp - rng.uniform(0, 5), 2), "temp_min": round(temp - 4, 2),
+                 "temp_max": round(temp + 4, 2), "humidity": rng.randint(20, 95)},
+    }
+
+
+def _mock_image():
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.linear_gradient("L").convert("RGB").resize((320, 240)).save(output, "PNG")
+    return output.getvalue()
+
+
+class MockOpenAI:
+    """Request handling and statistics, shared by every connection of one server."""
+
+    def __init__(self, config=None):
+        self.config = config or MockConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.requests = []
+        self._image = None
+
+    def next_id(self, prefix):
+        with self._lock:
+            self._counter += 1
+            return f"{prefix}-mock-{self._counter}"
+
+    def first_token_delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.config.jitter, self.config.jitter)
+            fail = self._rng.random() < self.config.error_rate
+        return max(0.0, self.config.latency + jitter), fail
+
+    def record(self, **fields):
+        with self._lock:
+            self.requests.append(fields)
+
+    def stats(self):
+        with self._lock:
+            return {"config": asdict(self.config), "requests": list(self.requests)}
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+
+    def image(self):
+        if self._image is None:
+            self._image = _mock_image()
+        return self._image
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock = None  # set on the subclass made by make_server()
+
+    def log_message(self, format, *args):
+        pass
+
+    # ── plumbing ────────────────────────────────────────────────────
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _send_event(self, data):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _fail(self, endpoint, started):
+        status = self.mock.config.error_status
+        self.mock.record(endpoint=endpoint, stream=False, status=status, start=started,
+                         first_token=None, end=time.time(), output_tokens=0)
+        self._send_json(status, {"error": {
+            "message": f"Injected {status} error from the mock server",
+            "type": ERROR_TYPES.get(status, "server_error"),
+            "code": ERROR_TYPES.get(status),
+        }})
+
+    def _emit_tokens(self, tokens, send):
+        """Call send(token) for every token, paced at tokens_per_second. Returns the first token's time."""
+        interval = 1.0 / self.mock.config.tokens_per_second if self.mock.config.tokens_per_second > 0 else 0
+        first = None
+        for token in tokens:
+            send(token)
+            first = first or time.time()
+            if interval:
+                time.sleep(interval)
+        return first or time.time()
+
+    # ── routes ──────────────────────────────────────────────────────
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "created": 0, "owned_by": "mock"}
+                for model in ("gpt-4o-mini", "gpt-4o", "gpt-4.1-mini", "gpt-4.1", "text-embedding-3-small")
+            ]})
+        elif path == "/mock/stats":
+            self._send_json(200, self.mock.stats())
+        elif path == "/mock/image.png":
+            image = self.mock.image()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(image)))
+            self.end_headers()
+            self.wfile.write(image)
+        elif path == "/data/2.5/weather":
+            query = parse_qs(urlsplit(self.path).query)
+            self._send_json(200, mock_weather(query.get("q", ["Syracuse"])[0]))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        body = self._read_body()
+        routes = {
+            "/chat/completions": self._chat_completions,
+            "/embeddings": self._embeddings,
+            "/responses": self._responses,
+        }
+        if path == "/mock/reset":
+            self.mock.reset()
+            self._send_json(200, {"ok": True})
+            return
+        for suffix, handler in routes.items():
+            if path.endswith(suffix):
+                started = time.time()
+                delay, fail = self.mock.first_token_delay()
+                time.sleep(delay)
+                if fail:
+                    self._fail(suffix.strip("/"), started)
+                else:
+                    handler(body, started)
+                return
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def _reply_tokens(self, schema=None):
+        if schema is not None:
+            # structured output: the whole JSON document, split roughly into tokens
+            text = json.dumps(sample_for_schema(schema))
+            return [text[i:i + 4] for i in range(0, len(text), 4)]
+        return filler_tokens(self.mock.config.reply_tokens)
+
+    def _tool_call(self, body):
+        """The function call to reply with, or None when the model should answer in text."""
+        tools = [tool for tool in body.get("tools") or [] if tool.get("type") == "function"]
+        messages = body.get("messages") or []
+        if not tools or body.get("tool_choice") == "none" or (messages and messages[-1].get("role") == "tool"):
+            return None
+        function = tools[0]["function"]
+        choice = body.get("tool_choice")
+        if isinstance(choice, dict) and choice.get("function"):
+            function = next((tool["function"] for tool in tools
+                             if tool["function"]["name"] == choice["function"]["name"]), function)
+        arguments = sample_for_schema(function.get("parameters") or {"type": "object"})
+        return {"id": self.mock.next_id("call"), "type": "function",
+                "function": {"name": function["name"], "arguments": json.dumps(arguments)}}
+
+    def _chat_completions(self, body, started):
+        model = body.get("model", "gpt-4o-mini")
+        response_format = body.get("response_format") or {}
+        schema = response_format.get("json_schema", {}).get("schema") if response_format.get("type") == "json_schema" else None
+        tool_call = self._tool_call(body)
+        if tool_call:
+            # the arguments stream as the reply, the way the API sends them
+            arguments = tool_call["function"]["arguments"]
+            tokens = [arguments[i:i + 4] for i in range(0, len(arguments), 4)]
+        else:
+            tokens = self._reply_tokens(schema)
+        finish_reason = "tool_calls" if tool_call else "stop"
+        prompt_tokens = estimate_tokens(body.get("messages"))
+        completion_id = self.mock.next_id("chatcmpl")
+        created = int(started)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+
+        if body.get("stream"):
+            self._start_stream()
+
+            def chunk(delta, finish_reason=None):
+                return {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            if tool_call:
+                self._send_event(chunk({"role": "assistant", "content": None, "tool_calls": [{
+                    "index": 0, "id": tool_call["id"], "type": "function",
+                    "function": {"name": tool_call["function"]["name"], "arguments": ""},
+                }]}))
+                first = self._emit_tokens(tokens, lambda token: self._send_event(chunk(
+                    {"tool_calls": [{"index": 0, "function": {"arguments": token}}]})))
+            else:
+                self._send_event(chunk({"role": "assistant", "content": ""}))
+                first = self._emit_tokens(tokens, lambda token: self._send_event(chunk({"content": token})))
+            self._send_event(chunk({}, finish_reason))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._send_event({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                                  "model": model, "choices": [], "usage": usage})
+            self._send_event("[DONE]")
+        else:
+            first = self._emit_tokens(tokens, lambda token: None)
+            if tool_call:
+                message = {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+            else:
+                message = {"role": "assistant", "content": "".join(tokens)}
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+                "usage": usage,
+            })
+        self.mock.record(endpoint="chat/completions", stream=bool(body.get("stream")), status=200,
+                         start=started, first_token=first, end=time.time(), output_tokens=len(tokens))
+
+    def _embeddings(self, body, started):
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(str(text), dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = estimate_tokens(inputs)
+        self._send_json(200, {"object": "list", "data": data, "model": body.get("model", "text-embedding-3-small"),
+                              "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+        now = time.time()
+        self.mock.record(endpoint="embeddings", stream=False, status=200, start=started,
+                         first_token=now, end=now, output_tokens=0)
+
+    def _responses(self, body, started):
+        model = body.get("model", "gpt-4o")
+        text_format = (body.get("text") or {}).get("format") or {}
+        schema = text_format.get("schema") if text_format.get("type") == "json_schema" else None
+        tokens = self._reply_tokens(schema)
+        response_id = self.mock.next_id("resp")
+        message_id = self.mock.next_id("msg")
+        input_tokens = estimate_tokens(body.get("input")) + estimate_tokens(body.get("instructions"))
+
+        def response_object(status, text):
+            return {
+                "id": response_id, "object": "response", "created_at": int(started), "model": model,
+                "status": status, "error": None, "incomplete_details": None,
+                "instructions": body.get("instructions"), "previous_response_id": body.get("previous_response_id"),
+                "parallel_tool_calls": True, "tool_choice": "auto", "tools": [], "metadata": {},
+                "temperature": 1.0, "top_p": 1.0, "text": {"format": text_format or {"type": "text"}},
+                "output": [] if text is None else [{
+                    "type": "message", "id": message_id, "status": "completed", "role": "assistant",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }],
+                "usage": None if text is None else {
+                    "input_tokens": input_tokens, "output_tokens": len(tokens),
+                    "total_tokens": input_tokens + len(tokens),
+                    "input_tokens_details": {"cached_tokens": 0},
+                    "output_tokens_details": {"reasoning_tokens": 0},
+                },
+            }
+
+        if body.get("stream"):
+            self._start_stream()
+            sequence = iter(range(10 ** 9))
+            self._send_event({"type": "response.created", "sequence_number": next(sequence),
+                              "response": response_object("in_progress", None)})
+            first = self._emit_tokens(tokens, lambda token: self._send_event({
+                "type": "response.output_text.delta", "sequence_number": next(sequence), "item_id": message_id,
+                "output_index": 0, "content_index": 0, "delta": token, "logprobs": [],
+            }))
+            self._send_event({"type": "response.completed", "sequence_number": next(sequence),
+                              "response": response_object("completed", "".join(tokens))})
+        else:
+            first = self._emit_tokens(tokens, lambda token: None)
+            self._send_json(200, response_object("completed", "".join(tokens)))
+        self.mock.record(endpoint="responses", stream=bool(body.get("stream")), status=200,
+                         start=started, first_token=first, end=time.time(), output_tokens=len(tokens))
+
+
+def make_server(config=None, host="127.0.0.1", port=0):
+    """A ThreadingHTTPServer speaking the mock API (port 0 picks a free port).
+
+    The MockOpenAI state is available as server.mock.
+    """
+    mock = MockOpenAI(config)
+    handler = type("MockOpenAIHandler", (_Handler,), {"mock": mock})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.mock = mock
+    return server
+
+
+def start_in_background(config=None, host="127.0.0.1", port=0):
+    """Start a mock server on a daemon thread. Returns (server, base_url)."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_config_arguments(parser):
+    defaults = MockConfig()
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="+/- seconds of latency variation")
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second,
+                        help="output token rate (0 = as fast as possible)")
+    parser.add_argument("--reply-tokens", type=int, default=defaults.reply_tokens, help="tokens in every text reply")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status, help="HTTP status of injected errors")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens, error_rate=args.error_rate, error_status=args.error_status,
+        seed=args.seed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local mock of the OpenAI API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = make_server(config_from_args(args), args.host, args.port)
+    print(f"Mock OpenAI API on http://{args.host}:{server.server_address[1]}/v1 "
+          f"(set OPENAI_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""On-disk cache of extracted PDF pages, keyed by the SHA-256 of the PDF bytes.
+
+Each PDF is stored as one file:
+
+    magic (4 bytes) | page count (uint32)
+    per page: text offset (uint64), text length (uint32), seconds (float64)
+    UTF-8 text of all pages back to back
+
+The file is opened with mmap, so reading a cached document is just a
+slice-and-decode per page. The file's mtime doubles as its last-used time:
+it is touched on every hit and the oldest files are evicted once the
+cache grows past max_bytes.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+from lab_utils.pdf_extract import PageText, _as_source, extract_pages
+
+MAGIC = b"PDT1"
+HEADER = struct.Struct("<4sI")
+ENTRY = struct.Struct("<QId")
+
+DEFAULT_CACHE_DIR = Path(".cache/pdf_text")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class PdfTextCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest):
+        return self.directory / f"{digest}.pages"
+
+    def get(self, digest):
+        """Return the cached list of PageText, or None on a miss."""
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, page_count = HEADER.unpack_from(mm, 0)
+                if magic != MAGIC:
+                    raise ValueError("not a page cache file")
+                pages = []
+                for i in range(page_count):
+                    offset, length, seconds = ENTRY.unpack_from(mm, HEADER.size + i * ENTRY.size)
+                    text = mm[offset:offset + length].decode("utf-8")
+                    pages.append(PageText(i + 1, text, seconds))
+        except (FileNotFoundError, ValueError, struct.error):
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        return pages
+
+    def put(self, digest, pages):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        encoded = [page.text.encode("utf-8") for page in pages]
+        offset = HEADER.size + ENTRY.size * len(pages)
+        index = bytearray()
+        for page, data in zip(pages, encoded):
+            index += ENTRY.pack(offset, len(data), page.seconds)
+            offset += len(data)
+
+        path = self._path(digest)
+        # a temp file of our own: two sessions caching the same PDF must not share one
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=path.stem, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, len(pages)))
+                f.write(index)
+                f.write(b"".join(encoded))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used files until the cache fits in max_bytes."""
+        files = []
+        for p in self.directory.glob("*.pages"):
+            try:
+                files.append((p.stat(), p))
+            except FileNotFoundError:
+                pass    # evicted by another process meanwhile
+        total = sum(stat.st_size for stat, _ in files)
+        for stat, path in sorted(files, key=lambda item: item[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# one cache per process, so the counters survive Streamlit reruns
+pdf_cache = PdfTextCache()
+
+
+def cached_extract_pages(pdf, cache=pdf_cache):
+    """extract_pages(), but served from the cache when the same bytes were seen before."""
+    source = _as_source(pdf)
+    if isinstance(source, (bytes, bytearray)):
+        data = source
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    digest = content_hash(data)
+    pages = cache.get(digest)
+    if pages is None:
+        pages = extract_pages(data)
+        cache.put(digest, pages)
+    return pages
@@ -0,0 +1,152 @@
+"""PDF text extraction shared by Lab2 and Lab4.
+
+Pages are split into ranges and extracted in a process pool, since PyPDF2
+is pure Python and would otherwise use a single core. Files can be
+extracted in parallel the same way with extract_many().
+
+The pool is started from Streamlit's multithreaded server, often from a
+background thread, so workers come from a forkserver rather than a fork
+of the server. They are started without re-running __main__, which under
+Streamlit is the page script.
+"""
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import NamedTuple
+
+# below this many pages the process pool costs more than it saves
+MIN_PAGES_FOR_POOL = 8
+# Windows has no forkserver
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_main_lock = threading.Lock()
+
+
+class PageText(NamedTuple):
+    page: int        # 1-based page number
+    text: str
+    seconds: float   # time spent extracting this page
+
+
+def _open_reader(source):
+    """source can be a path or the raw bytes of a PDF."""
+    from PyPDF2 import PdfReader
+
+    if isinstance(source, (bytes, bytearray)):
+        return PdfReader(io.BytesIO(source))
+    return PdfReader(source)
+
+
+def _extract_range(source, start=0, stop=None):
+    """Worker: extract pages [start, stop) and time each one. stop=None means to the end."""
+    reader = _open_reader(source)
+    if stop is None:
+        stop = len(reader.pages)
+    pages = []
+    for index in range(start, stop):
+        began = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        pages.append(PageText(index + 1, text, time.perf_counter() - began))
+    return pages
+
+
+def _page_ranges(page_count, workers):
+    size = -(-page_count // workers)  # ceiling division
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+@contextmanager
+def _process_pool(workers):
+    """A ProcessPoolExecutor whose workers only import this module."""
+    context = multiprocessing.get_context(START_METHOD)
+    if START_METHOD == "forkserver":
+        # the server imports this module instead of the default, __main__
+        context.set_forkserver_preload([__name__])
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        yield pool
+
+
+@contextmanager
+def _workers_skip_main():
+    """Submit work inside this block so the workers it starts skip __main__.
+
+    spawn and forkserver workers run the parent's __main__ again before
+    taking work; under Streamlit that would run the whole page (secrets,
+    background jobs) in every worker. ProcessPoolExecutor starts workers on
+    submit(), so for the length of the block __main__ is an empty module.
+    """
+    with _main_lock:
+        page_main = sys.modules["__main__"]
+        stand_in = types.ModuleType("__main__")
+        sys.modules["__main__"] = stand_in
+        try:
+            yield
+        finally:
+            # a script run that started meanwhile has installed its own __main__; leave that one
+            if sys.modules["__main__"] is stand_in:
+                sys.modules["__main__"] = page_main
+
+
+def _as_source(pdf):
+    """Accept a path, raw bytes, or a file-like object such as a Streamlit upload."""
+    if isinstance(pdf, (str, os.PathLike, bytes, bytearray)):
+        return pdf
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    pdf.seek(0)
+    return pdf.read()
+
+
+def iter_pages(pdf, max_workers=None):
+    """Yield a PageText for every page, in page order.
+
+    Short documents are extracted in this process. Longer ones are split
+    into page ranges that run in a process pool; ranges are yielded as soon
+    as they (and all earlier ranges) finish.
+    """
+    source = _as_source(pdf)
+    page_count = len(_open_reader(source).pages)
+    workers = min(max_workers or os.cpu_count() or 1, page_count)
+
+    if page_count < MIN_PAGES_FOR_POOL or workers < 2:
+        yield from _extract_range(source, 0, page_count)
+        return
+
+    with _process_pool(workers) as pool:
+        with _workers_skip_main():
+            futures = [pool.submit(_extract_range, source, start, stop)
+                       for start, stop in _page_ranges(page_count, workers)]
+        for future in futures:
+            yield from future.result()
+
+
+def extract_pages(pdf, max_workers=None):
+    """Return every page as a list of PageText."""
+    return list(iter_pages(pdf, max_workers))
+
+
+def extract_text_from_pdf(pdf, max_workers=None):
+    """Return the whole document as one string, pages separated by newlines."""
+    return "\n".join(page.text for page in iter_pages(pdf, max_workers))
+
+
+def extract_many(paths, max_workers=None):
+    """Extract several PDFs at once, one file per worker.
+
+    A single file is split by page range instead (see iter_pages()).
+    Returns a dict mapping each path to its list of PageText.
+    """
+    paths = list(paths)
+    if len(paths) < 2:
+        return {path: extract_pages(path, max_workers) for path in paths}
+
+    workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    with _process_pool(workers) as pool:
+        with _workers_skip_main():
+            futures = {path: pool.submit(_extract_range, path) for path in paths}
+        return {path: future.result() for path, future in futures.items()}
@@ -0,0 +1,54 @@
+"""Process-wide resources shared by streamlit_app.py and every lab.
+
+Streamlit re-runs a page's script on every interaction, so anything created
+at the top of a lab (API clients above all) would otherwise be rebuilt each
+time. These helpers hand out one pooled instance per process instead.
+"""
+import hashlib
+
+import streamlit as st
+
+# how long a successful API key check is trusted
+KEY_VALIDATION_TTL_SECONDS = 15 * 60
+# Lab1 takes keys typed in by users, so only this many clients are kept, each for at most an hour idle
+MAX_CLIENTS = 16
+CLIENT_TTL_SECONDS = 60 * 60
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_CLIENTS, ttl=CLIENT_TTL_SECONDS)
+def _openai_client(api_key):
+    # the openai package takes most of a second to import; only pay for it once a client is needed
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key)
+
+
+def get_openai_client(api_key=None):
+    """One OpenAI client (and connection pool) per API key, for the life of the process.
+
+    Without an api_key the OPENAI_API_KEY secret is used.
+    """
+    return _openai_client(api_key or st.secrets["OPENAI_API_KEY"])
+
+
+def key_fingerprint(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+@st.cache_data(ttl=KEY_VALIDATION_TTL_SECONDS, show_spinner=False)
+def _check_key(fingerprint, _api_key):
+    # the key itself is excluded from the cache key (leading underscore); only its hash is stored.
+    # Failures raise, and st.cache_data doesn't cache exceptions, so a bad key is re-checked next time
+    get_openai_client(_api_key).models.list()
+    return True
+
+
+def validate_api_key(api_key):
+    """Validate the API key with a lightweight API call, cached for a while per key.
+
+    Returns (is_valid, error message or None).
+    """
+    try:
+        return _check_key(key_fingerprint(api_key), api_key), None
+    except Exception as e:
+        return False, str(e)
@@ -0,0 +1,125 @@
+"""Cold-start report: how long each lab takes to import and to first render.
+
+    python -m lab_utils.startup_report            # every page in Labs/
+    python -m lab_utils.startup_report Lab4 Lab9  # just these
+    python -m lab_utils.startup_report --json
+
+Every lab is measured in a fresh interpreter, so nothing is shared between
+them. The lab's top-level imports are timed one by one (after streamlit,
+which every page pays for anyway), then the page is run twice with
+streamlit's AppTest: the first run includes deferred initialization
+(cached resources, databases, indexes), the second is a warm rerun.
+Dummy secrets are used and the pages run in a scratch directory, so no
+real API calls succeed and the working tree is left alone.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+LABS_DIR = REPO_ROOT / "Labs"
+# folders the labs read relative to the working directory
+DATA_DIRS = ["Lab-04-Data"]
+DUMMY_SECRETS = {"OPENAI_API_KEY": "sk-startup-report", "OPEN_WEATHER_API_KEY": "startup-report"}
+RUN_TIMEOUT = 120
+
+# runs in the child interpreter; prints one JSON object
+_CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+report = {"streamlit_import": time.perf_counter() - t0, "imports": []}
+for statement in json.loads(sys.argv[2]):
+    start = time.perf_counter()
+    try:
+        exec(statement, {})
+        error = None
+    except Exception as e:
+        error = repr(e)
+    report["imports"].append({"statement": statement, "seconds": time.perf_counter() - start, "error": error})
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[4]))
+for key, value in json.loads(sys.argv[3]).items():
+    at.secrets[key] = value
+for name in ("first_run", "rerun"):
+    start = time.perf_counter()
+    try:
+        at.run()
+        error = "; ".join(e.message for e in at.exception) or None
+    except Exception as e:
+        error = repr(e)
+    report[name] = time.perf_counter() - start
+    report[name + "_error"] = error
+print(json.dumps(report))
+'''
+
+
+def import_statements(path):
+    """The page's module-level import statements, as source lines, in order."""
+    tree = ast.parse(Path(path).read_text(), filename=str(path))
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure_lab(path, timeout=RUN_TIMEOUT):
+    """Measure one page in a fresh interpreter. Returns the child's report dict."""
+    path = Path(path).resolve()
+    with tempfile.TemporaryDirectory(prefix="startup-report-") as workdir:
+        for name in DATA_DIRS:
+            if (REPO_ROOT / name).exists():
+                os.symlink(REPO_ROOT / name, Path(workdir) / name)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+        proc = subprocess.run(
+            [sys.executable, "-c", _CHILD, str(path), json.dumps(import_statements(path)),
+             json.dumps(DUMMY_SECRETS), str(timeout)],
+            cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout * 3,
+        )
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return {"lab": path.stem, "error": proc.stderr.strip().splitlines()[-1:] or ["no output"]}
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report["lab"] = path.stem
+    report["import_total"] = sum(item["seconds"] for item in report["imports"])
+    return report
+
+
+def format_table(reports, top=3):
+    lines = [f"{'page':<8} {'imports':>8} {'1st run':>8} {'rerun':>8}  slowest imports"]
+    for report in reports:
+        if "error" in report:
+            lines.append(f"{report['lab']:<8} failed: {report['error'][0]}")
+            continue
+        slowest = sorted(report["imports"], key=lambda item: item["seconds"], reverse=True)[:top]
+        lines.append(
+            f"{report['lab']:<8} {report['import_total']:>7.2f}s {report['first_run']:>7.2f}s "
+            f"{report['rerun']:>7.2f}s  "
+            + ", ".join(f"{item['statement']} ({item['seconds']:.2f}s)" for item in slowest)
+        )
+        for name in ("first_run_error", "rerun_error"):
+            if report.get(name):
+                lines.append(f"{'':<8} {name.replace('_', ' ')}: {report[name][:100]}")
+    lines.append("(streamlit itself, imported by every page, is not included in 'imports')")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report import and first-render time for each lab.")
+    parser.add_argument("labs", nargs="*", help="page names, e.g. Lab4 (default: every page in Labs/)")
+    parser.add_argument("--json", action="store_true", help="print the raw measurements as JSON")
+    parser.add_argument("--timeout", type=float, default=RUN_TIMEOUT, help="seconds allowed per page run")
+    args = parser.parse_args(argv)
+
+    paths = [LABS_DIR / f"{name}.py" for name in args.labs] or sorted(LABS_DIR.glob("*.py"))
+    reports = []
+    for path in paths:
+        print(f"measuring {path.stem}...", file=sys.stderr)
+        reports.append(measure_lab(path, args.timeout))
+    print(json.dumps(reports, indent=2) if args.json else format_table(reports))
+    return 1 if any("error" in report for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Map-reduce summarization for documents too long to summarize in one call.
+
+The document is split into token-bounded sections, every section is
+summarized concurrently (at most `concurrency` requests in flight), and the
+section summaries are combined again until they fit in one final request.
+After MAX_REDUCE_LEVELS rounds whatever is left is cut to fit, so a model
+that won't shorten its input can't keep the loop going.
+"""
+import asyncio
+
+from lab_utils.chunking import chunk_text, count_text_tokens
+
+# documents up to this size are summarized in a single request
+SINGLE_SHOT_TOKENS = 12000
+SECTION_TOKENS = 3000
+SECTION_OVERLAP = 100
+MAX_CONCURRENCY = 4
+# rounds of summarizing the summaries before the rest is truncated
+MAX_REDUCE_LEVELS = 3
+
+SECTION_PROMPT = (
+    "Summarize this section of a longer document. Keep the key facts, names, "
+    "dates and numbers. Do not add an introduction or conclusion.\n\nSection:\n{section}"
+)
+
+
+def needs_map_reduce(document):
+    return count_text_tokens(document) > SINGLE_SHOT_TOKENS
+
+
+def split_sections(text):
+    return [section for _, section in chunk_text(text, SECTION_TOKENS, SECTION_OVERLAP)]
+
+
+async def _summarize_sections(async_client, sections, model, concurrency, on_progress):
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def summarize(section):
+        nonlocal done
+        async with semaphore:
+            response = await async_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": SECTION_PROMPT.format(section=section)}],
+            )
+        done += 1
+        if on_progress:
+            on_progress(done, len(sections))
+        return response.choices[0].message.content
+
+    # gather keeps the summaries in section order
+    return await asyncio.gather(*(summarize(section) for section in sections))
+
+
+async def _reduce_to_fit(async_client, document, model, concurrency, on_progress):
+    text = document
+    for _ in range(MAX_REDUCE_LEVELS):
+        if count_text_tokens(text) <= SINGLE_SHOT_TOKENS:
+            return text
+        summaries = await _summarize_sections(
+            async_client, split_sections(text), model, concurrency, on_progress
+        )
+        text = "\n\n".join(summaries)
+    if count_text_tokens(text) > SINGLE_SHOT_TOKENS:
+        # keep the first window; chunk_text's windows are token-exact
+        _, text = next(chunk_text(text, SINGLE_SHOT_TOKENS, 0))
+    return text
+
+
+def condense_document(async_client, document, model, concurrency=MAX_CONCURRENCY, on_progress=None):
+    """Summarize sections (up to MAX_REDUCE_LEVELS times) until the result fits one request.
+
+    on_progress(done, total) is called after each section summary.
+    """
+    return asyncio.run(_reduce_to_fit(async_client, document, model, concurrency, on_progress))
+
+
+def build_summary_messages(instruction, document, condensed=False):
+    """Messages for the final (streamed) summary request."""
+    if condensed:
+        content = (
+            f"{instruction}\n\nThe document was too long to send at once, so below are "
+            f"summaries of its sections, in order. Treat them together as the document.\n\n"
+            f"Document: {document}"
+        )
+    else:
+        content = f"{instruction}\n\nDocument: {document}"
+    return [{"role": "user", "content": content}]
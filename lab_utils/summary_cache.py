@@ -0,0 +1,106 @@
+"""Persistent cache of finished Lab2 summaries.
+
+Keyed by (document hash, summary type, model). Entries expire after a TTL,
+and the least recently used ones are dropped once the stored text goes
+over max_bytes.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_DB_PATH = Path(".cache/summaries.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+def document_hash(document):
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+def replay_stream(text):
+    """Yield a cached summary in small pieces so st.write_stream renders it like a live one."""
+    for piece in re.findall(r"\S+\s*|\s+", text):
+        yield piece
+
+
+class SummaryCache:
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._db is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "doc_hash TEXT, summary_type TEXT, model TEXT, summary TEXT, "
+                "size INTEGER, created_at REAL, last_used REAL, "
+                "PRIMARY KEY (doc_hash, summary_type, model))"
+            )
+        return self._db
+
+    def get(self, doc_hash, summary_type, model):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT summary FROM summaries WHERE doc_hash = ? AND summary_type = ? "
+                "AND model = ? AND created_at > ?",
+                (doc_hash, summary_type, model, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with db:
+                db.execute(
+                    "UPDATE summaries SET last_used = ? WHERE doc_hash = ? AND summary_type = ? AND model = ?",
+                    (now, doc_hash, summary_type, model),
+                )
+            self.hits += 1
+            return row[0]
+
+    def put(self, doc_hash, summary_type, model, summary):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_hash, summary_type, model, summary,
+                     len(summary.encode("utf-8")), now, now),
+                )
+                self._evict(db, now)
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM summaries WHERE created_at <= ?", (now - self.ttl_seconds,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = db.execute(
+            "SELECT doc_hash, summary_type, model, size FROM summaries ORDER BY last_used"
+        ).fetchall()
+        for doc_hash, summary_type, model, size in rows:
+            if total <= self.max_bytes:
+                break
+            db.execute(
+                "DELETE FROM summaries WHERE doc_hash = ? AND summary_type = ? AND model = ?",
+                (doc_hash, summary_type, model),
+            )
+            total -= size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# one cache per process, shared by every session
+summary_cache = SummaryCache()
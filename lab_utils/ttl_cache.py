@@ -0,0 +1,50 @@
+"""A small thread-safe TTL cache with hit/miss counters."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds, max_items=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._items = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (value, True) on a hit, (None, False) on a miss or expired entry."""
+        with self._lock:
+            item = self._items.get(key)
+            if item and item[0] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1], True
+            if item:
+                del self._items[key]
+            self.misses += 1
+            return None, False
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return (value, hit), calling compute() and caching its result on a miss."""
+        value, hit = self.get(key)
+        if not hit:
+            value = compute()
+            self.put(key, value)
+        return value, hit
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,4 +1,5 @@
 import streamlit as st
+from lab_utils.resources import get_openai_client
 st.title('IST 488 Labs')
 lab1 = st.Page('Labs/Lab1.py', title = 'Lab1', icon = '💻')
 lab2 = st.Page('Labs/Lab2.py', title = 'Lab2', icon = '💻')
@@ -10,6 +11,10 @@ lab8 = st.Page('Labs/Lab8.py', title = 'Lab8', icon = '💻')
 lab9 = st.Page('Labs/Lab9.py', title = 'Lab9', icon = '💻', default = True)
 
 
+# create the shared OpenAI client once per process, before any page asks for it
+if st.secrets.get("OPENAI_API_KEY"):
+    get_openai_client()
+
 pg = st.navigation([lab1, lab2, lab3, lab4, lab5, lab6, lab8, lab9])
 st.set_page_config(page_title = 'IST 488 Labs',
                    initial_sidebar_state='expanded')
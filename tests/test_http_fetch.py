@@ -0,0 +1,145 @@
+"""fetch_url against a local http.server: network, cache, revalidation and errors.
+
+    python -m pytest tests/test_http_fetch.py
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from lab_utils.http_fetch import HttpCache, fetch_url
+
+BODY = b"<html><body>Course page</body></html>"
+ETAG = '"course-page-v1"'
+LAST_MODIFIED = formatdate(0, usegmt=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests = []   # (path, status) for every request served
+    page = {"body": BODY, "etag": ETAG}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        page = self.page
+        if self.path != "/page.html":
+            status = 404
+        elif self.headers.get("If-None-Match") == page["etag"]:
+            status = 304
+        else:
+            status = 200
+        # recorded before replying, so the client never sees a response that isn't listed yet
+        self.requests.append((self.path, status))
+        self.send_response(status)
+        if status == 200:
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(page["body"])))
+            self.send_header("ETag", page["etag"])
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        elif status == 304:
+            self.send_header("ETag", page["etag"])
+        else:
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+        if status == 200:
+            self.wfile.write(page["body"])
+
+
+@pytest.fixture
+def server():
+    handler = type("Handler", (_Handler,), {"requests": [], "page": dict(_Handler.page)})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_first_fetch_uses_the_network(server, tmp_path):
+    root, handler = server
+    requests = handler.requests
+    result = fetch_url(root + "/page.html", cache=HttpCache(tmp_path))
+    assert (result.source, result.content, result.error) == ("network", BODY, None)
+    assert requests == [("/page.html", 200)]
+
+
+def test_fetch_within_ttl_is_served_from_cache(server, tmp_path):
+    root, handler = server
+    requests = handler.requests
+    cache = HttpCache(tmp_path, ttl_seconds=60)
+    fetch_url(root + "/page.html", cache=cache)
+    result = fetch_url(root + "/page.html", cache=cache)
+    assert (result.source, result.content) == ("cache", BODY)
+    assert len(requests) == 1
+
+
+def test_fetch_after_ttl_revalidates(server, tmp_path):
+    root, handler = server
+    requests = handler.requests
+    cache = HttpCache(tmp_path, ttl_seconds=60)
+    fetch_url(root + "/page.html", cache=cache)
+    cache.ttl_seconds = 0
+    result = fetch_url(root + "/page.html", cache=cache)
+    assert (result.source, result.content) == ("revalidated", BODY)
+    assert requests == [("/page.html", 200), ("/page.html", 304)]
+    meta, _ = cache.load(root + "/page.html")
+    assert (meta["etag"], meta["last_modified"]) == (ETAG, LAST_MODIFIED)
+
+
+def test_missing_page_is_an_error_result(server, tmp_path):
+    root, _ = server
+    cache = HttpCache(tmp_path)
+    result = fetch_url(root + "/missing.html", cache=cache)
+    assert result.source == "error"
+    assert result.content is None
+    assert result.error.response.status_code == 404
+    assert cache.load(root + "/missing.html") == (None, None)
+
+
+def test_stale_entry_for_a_changed_page_is_replaced(server, tmp_path):
+    root, handler = server
+    cache = HttpCache(tmp_path, ttl_seconds=0)
+    fetch_url(root + "/page.html", cache=cache)
+    handler.page.update(body=b"<html><body>New term</body></html>", etag='"course-page-v2"')
+    result = fetch_url(root + "/page.html", cache=cache)
+    assert (result.source, result.content) == ("network", b"<html><body>New term</body></html>")
+    assert handler.requests == [("/page.html", 200), ("/page.html", 200)]
+    meta, body = cache.load(root + "/page.html")
+    assert (meta["etag"], body) == ('"course-page-v2"', b"<html><body>New term</body></html>")
+    # and the new validator is the one sent next time
+    assert fetch_url(root + "/page.html", cache=cache).source == "revalidated"
+
+
+def test_unwritable_cache_still_serves_the_page(server, tmp_path):
+    root, handler = server
+    blocked = tmp_path / "not-a-directory"
+    blocked.write_text("")
+    result = fetch_url(root + "/page.html", cache=HttpCache(blocked / "http"))
+    assert (result.source, result.content, result.error) == ("network", BODY, None)
+
+
+def test_revalidation_survives_a_failed_cache_write(server, tmp_path, monkeypatch):
+    root, handler = server
+    cache = HttpCache(tmp_path, ttl_seconds=0)
+    fetch_url(root + "/page.html", cache=cache)
+
+    def full_disk(path, data):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(cache, "_write", full_disk)
+    result = fetch_url(root + "/page.html", cache=cache)
+    assert (result.source, result.content, result.error) == ("revalidated", BODY, None)
+
+
+def test_concurrent_fetches_of_one_url_leave_a_whole_entry(server, tmp_path):
+    root, handler = server
+    cache = HttpCache(tmp_path, ttl_seconds=0)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: fetch_url(root + "/page.html", cache=cache), range(32)))
+    assert all(result.content == BODY for result in results)
+    meta, body = cache.load(root + "/page.html")
+    assert (meta["etag"], body) == (ETAG, BODY)
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,38 @@
+"""prepare_image: what gets sent, and that the reported size matches it.
+
+    python -m pytest tests/test_image_prep.py
+"""
+import io
+
+import numpy as np
+import pytest
+
+from lab_utils.image_prep import prepare_image
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _encode(image, format):
+    output = io.BytesIO()
+    image.save(output, format)
+    return output.getvalue()
+
+
+def _decoded_size(prepared):
+    return Image.open(io.BytesIO(prepared.data)).size
+
+
+def test_large_photo_is_resized_and_recompressed():
+    pixels = np.random.default_rng(0).integers(0, 256, size=(1200, 1600, 3), dtype=np.uint8)
+    prepared = prepare_image(_encode(Image.fromarray(pixels), "PNG"), "low", "image/png")
+    assert prepared.mime == "image/jpeg"
+    assert (prepared.width, prepared.height) == _decoded_size(prepared) == (512, 384)
+    assert prepared.saved_bytes > 0
+
+
+def test_kept_original_reports_its_own_size():
+    # a blank 1-bit PNG is smaller than any JPEG of it, so the original bytes are sent as they are
+    data = _encode(Image.new("1", (1600, 1200), 1), "PNG")
+    prepared = prepare_image(data, "low", "image/png")
+    assert (prepared.data, prepared.mime) == (data, "image/png")
+    assert (prepared.width, prepared.height) == _decoded_size(prepared) == (1600, 1200)
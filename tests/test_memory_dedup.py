@@ -0,0 +1,91 @@
+"""Which Lab9 memories count as duplicates, and what add() and compact() do with them.
+
+    python -m pytest tests/test_memory_dedup.py
+"""
+import numpy as np
+import pytest
+
+from lab_utils.memory_dedup import key_tokens, same_fact, unit_vector
+from lab_utils.memory_store import MemoryStore
+
+# differ only in a short token, so both must be kept
+DISTINCT = [
+    ("User is taking IST 418", "User is taking IST 488"),
+    ("User is taking IST 387", "User is taking IST 418"),
+    ("User's friend is Anna", "User's friend is Anne"),
+    ("User's exam is on March 3", "User's exam is on March 13"),
+    ("User graduates in 2026", "User graduates in 2027"),
+    ("User's student ID is 123456", "User's student ID is 123457"),
+]
+
+
+def _vector(seed, noise_seed=None, noise=0.0):
+    """A random unit vector; with noise_seed, a nearby one (cosine ~0.99 at noise 0.1)."""
+    vector = np.random.default_rng(seed).normal(size=64)
+    if noise_seed is not None:
+        vector = unit_vector(vector) + noise * unit_vector(np.random.default_rng(noise_seed).normal(size=64))
+    return unit_vector(vector)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MemoryStore(tmp_path / "memories.sqlite3")
+
+
+@pytest.mark.parametrize("first, second", DISTINCT)
+def test_facts_that_differ_in_a_number_or_name_are_not_duplicates(first, second):
+    assert key_tokens(first) != key_tokens(second)
+    # even when their embeddings are nearly identical
+    assert not same_fact(first, second, _vector(1), _vector(1, 2, 0.1))
+
+
+def test_paraphrase_is_a_duplicate_by_embedding_only():
+    first, second = "User's name is Alice", "The user is called Alice"
+    assert key_tokens(first) == key_tokens(second) == {"alice"}
+    assert same_fact(first, second, _vector(1), _vector(1, 2, 0.1))
+    assert not same_fact(first, second)
+
+
+@pytest.mark.parametrize("first, second", DISTINCT)
+def test_add_keeps_both_facts(store, first, second):
+    store.add("u", [first])
+    store.add("u", [second])
+    assert store.list("u") == [first, second]
+    store.add("v", [first, second], [_vector(1), _vector(1, 2, 0.1)])
+    assert store.list("v") == [first, second]
+
+
+def test_add_merges_a_paraphrase_into_the_longer_fact(store):
+    store.add("u", ["User's name is Alice"], [_vector(1)])
+    counts = store.add("u", ["The user is called Alice"], [_vector(1, 2, 0.1)])
+    assert counts == {"added": 0, "merged": 1, "skipped": 0}
+    assert store.list("u") == ["The user is called Alice"]
+    counts = store.add("u", ["User is Alice"], [_vector(1, 3, 0.1)])
+    assert counts["skipped"] == 1
+    assert store.list("u") == ["The user is called Alice"]
+
+
+def test_embeddings_are_not_overruled_by_minhash(store):
+    # identical wording, but the embeddings say these are different memories
+    store.add("u", ["User likes the new library"], [_vector(1)])
+    store.add("u", ["User likes the new library."], [_vector(2)])
+    assert len(store.list("u")) == 2
+
+
+def test_memories_without_embeddings_merge_on_near_identical_wording(store):
+    store.add("u", ["User likes green tea"])
+    assert store.add("u", ["user likes green tea."])["added"] == 0
+    assert store.list("u") == ["user likes green tea."]
+
+
+def test_compact_only_folds_confirmed_duplicates(store):
+    facts = sorted({fact for pair in DISTINCT for fact in pair})
+    # inserted directly so add() can't merge anything first
+    for fact in facts:
+        store._db.execute("INSERT INTO memories (user_id, fact, created_at) VALUES ('u', ?, 0)", (fact,))
+    store._db.execute("INSERT INTO memories (user_id, fact, created_at) VALUES ('u', 'User likes green tea', 0)")
+    store._db.execute("INSERT INTO memories (user_id, fact, created_at) VALUES ('u', 'user likes green tea.', 0)")
+    store._db.commit()
+    store._cache.clear()
+    assert store.compact("u") == 1
+    assert sorted(store.list("u")) == sorted(set(facts) | {"user likes green tea."})
@@ -0,0 +1,58 @@
+"""MemoryStore's in-process cache stays in step with the database.
+
+    python -m pytest tests/test_memory_store.py
+"""
+import numpy as np
+import pytest
+
+from lab_utils import chunking
+from lab_utils.benchmarks import StubEncoding
+from lab_utils.memory_store import MemoryStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # relevant() counts tokens; don't depend on tiktoken downloading its encodings
+    stub = StubEncoding()
+    monkeypatch.setattr(chunking, "get_chunk_encoding", lambda: stub)
+    return MemoryStore(tmp_path / "memories.sqlite3")
+
+
+def _snapshot(store, user_id):
+    entry = store._load(user_id)
+    vectors = {position: entry["matrix"][row].tolist() for row, position in enumerate(entry["embedded"])}
+    return entry["ids"], entry["facts"], entry["pinned"], vectors
+
+
+def test_writes_update_the_cache_in_place(store):
+    rng = np.random.default_rng(0)
+    store.add("u", ["User likes green tea", "User's name is Alice"], [rng.normal(size=8), None])
+    # build the lazy indexes so that writes have to keep them current
+    store.relevant("u", "tea", rng.normal(size=8))
+    store._duplicate_index(store._load("u"))
+    entry = store._load("u")
+
+    for i in range(40):
+        store.add("u", [f"User is taking IST {i}"], [rng.normal(size=8) if i % 3 else None])
+    store.add("u", ["user likes green tea."])                        # merged, keeps its vector
+    store.add("u", ["User's name is Alice!"], [rng.normal(size=8)])   # merged, gains a vector
+    store.set_pinned("u", entry["ids"][5], True)
+    assert store._load("u") is entry
+
+    cached = _snapshot(store, "u")
+    assert store.relevant("u", "IST 7", rng.normal(size=8))
+    store._cache.clear()
+    reloaded = _snapshot(store, "u")
+    assert cached[:3] == reloaded[:3]
+    assert cached[3].keys() == reloaded[3].keys()
+    for position in cached[3]:
+        assert np.allclose(cached[3][position], reloaded[3][position], atol=1e-6)
+    assert store.list("u")[0] == "user likes green tea."
+
+
+def test_lexical_indexes_follow_updates(store):
+    store.add("u", ["User likes green tea"])
+    index = store._duplicate_index(store._load("u"))
+    store.add("u", ["user likes green tea."])
+    assert index.find("user likes green tea.") == 0
+    assert store.relevant("u", "green tea") == ["user likes green tea."]
@@ -0,0 +1,39 @@
+"""PdfTextCache round trips, eviction and concurrent writers.
+
+    python -m pytest tests/test_pdf_cache.py
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from lab_utils.pdf_cache import PdfTextCache
+from lab_utils.pdf_extract import PageText
+
+PAGES = [PageText(1, "Syllabus", 0.01), PageText(2, "Grading — 40% labs", 0.02)]
+
+
+def test_put_then_get_returns_the_pages(tmp_path):
+    cache = PdfTextCache(tmp_path)
+    assert cache.get("abc") is None
+    cache.put("abc", PAGES)
+    assert cache.get("abc") == PAGES
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_oldest_files_are_evicted_past_max_bytes(tmp_path):
+    cache = PdfTextCache(tmp_path)
+    cache.put("old", PAGES)
+    cache.max_bytes = (tmp_path / "old.pages").stat().st_size
+    os.utime(tmp_path / "old.pages", (0, 0))
+    cache.put("new", PAGES)
+    assert cache.get("old") is None
+    assert cache.get("new") == PAGES
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_concurrent_puts_of_one_pdf_leave_a_whole_file(tmp_path):
+    cache = PdfTextCache(tmp_path)
+    many = [PageText(i, f"page {i} " * 200, 0.0) for i in range(1, 51)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: cache.put("same", many), range(32)))
+    assert cache.get("same") == many
+    assert not list(tmp_path.glob("*.tmp"))
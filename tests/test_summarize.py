@@ -0,0 +1,63 @@
+"""condense_document against a fake async client: it must always finish within the token budget.
+
+    python -m pytest tests/test_summarize.py
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from lab_utils import chunking, summarize
+from lab_utils.benchmarks import StubEncoding
+
+
+class _Completions:
+    """Answers every section with `shrink` of its own words."""
+
+    def __init__(self, shrink):
+        self.shrink = shrink
+        self.calls = 0
+
+    async def create(self, model, messages):
+        self.calls += 1
+        words = messages[0]["content"].split("Section:\n", 1)[1].split()
+        content = " ".join(words[:max(1, int(len(words) * self.shrink))])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _client(shrink):
+    return SimpleNamespace(chat=SimpleNamespace(completions=_Completions(shrink)))
+
+
+@pytest.fixture(autouse=True)
+def stub_encoding(monkeypatch):
+    stub = StubEncoding()
+    monkeypatch.setattr(chunking, "get_chunk_encoding", lambda: stub)
+    monkeypatch.setattr(summarize, "SINGLE_SHOT_TOKENS", 500)
+    monkeypatch.setattr(summarize, "SECTION_TOKENS", 100)
+    monkeypatch.setattr(summarize, "SECTION_OVERLAP", 10)
+
+
+DOCUMENT = " ".join(f"word{i}" for i in range(3000))
+
+
+def test_short_document_is_returned_unchanged():
+    client = _client(0.1)
+    assert summarize.condense_document(client, "A short page.", "model") == "A short page."
+    assert client.chat.completions.calls == 0
+
+
+def test_long_document_is_reduced_until_it_fits():
+    client = _client(0.1)
+    condensed = summarize.condense_document(client, DOCUMENT, "model")
+    assert summarize.count_text_tokens(condensed) <= summarize.SINGLE_SHOT_TOKENS
+    assert condensed.startswith("word0")
+
+
+def test_model_that_does_not_shorten_is_cut_off_after_max_levels():
+    client = _client(1.0)
+    progress = []
+    condensed = summarize.condense_document(client, DOCUMENT, "model", on_progress=lambda *p: progress.append(p))
+    assert summarize.count_text_tokens(condensed) <= summarize.SINGLE_SHOT_TOKENS
+    # section overlap makes every level longer than the last; each level restarts the count at 1
+    assert [done for done, _ in progress].count(1) == summarize.MAX_REDUCE_LEVELS
+    assert client.chat.completions.calls == len(progress)